@@ -1,26 +1,66 @@
 """Config loader for train/test splits. Usage: get_split('70') returns (train_files, test_files)"""
 
-import os, yaml
+import os, json, tempfile, functools, yaml
 from pathlib import Path
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 CONFIG_DIR = Path(__file__).parent
-with open(CONFIG_DIR / "data_splits.yaml") as f:
-    _cfg = yaml.safe_load(f)
+CONFIG_FILE = CONFIG_DIR / "data_splits.yaml"
+CACHE_FILE = CONFIG_DIR / "data_splits.yaml.json"
+
+def _load_cfg():
+    """Load the split config, preferring the JSON sidecar when it is not older than the YAML."""
+    try:
+        if CACHE_FILE.stat().st_mtime >= CONFIG_FILE.stat().st_mtime:
+            with open(CACHE_FILE) as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    with open(CONFIG_FILE) as f:
+        cfg = yaml.load(f, Loader=_YamlLoader)
+    try:
+        fd, tmp = tempfile.mkstemp(dir=CONFIG_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(cfg, f)
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        pass  # read-only checkout: keep going without the cache
+    return cfg
+
+_cfg = _load_cfg()
 DATA_DIR = CONFIG_DIR.parent / _cfg['data_dir']
 
+_PATHS = {fid: str(DATA_DIR / name) for fid, name in _cfg['files'].items()}
+_LABELS = {p: 'malicious' if '_CF_' in p else 'benign' for p in _PATHS.values()}
+
 def _expand(file_ids):
     """Expand file IDs to full file paths."""
-    return [str(DATA_DIR / _cfg['files'][fid]) for fid in file_ids]
+    return tuple(_PATHS[fid] for fid in file_ids)
+
+@functools.lru_cache(maxsize=None)
+def _split(pct: str):
+    """Cached (train, test) path tuples for a split."""
+    return _expand(_cfg['splits'][pct]), _expand(_cfg['test'])
+
+@functools.lru_cache(maxsize=None)
+def _labeled_split(pct: str):
+    """Cached (train, test) (path, label) tuples for a split."""
+    train, test = _split(pct)
+    return tuple((f, _LABELS[f]) for f in train), tuple((f, _LABELS[f]) for f in test)
 
 def get_split(pct: str):
     """Get (train_files, test_files) for split '30', '50', or '70'."""
-    return _expand(_cfg['splits'][pct]), _expand(_cfg['test'])
+    train, test = _split(pct)
+    return list(train), list(test)
 
 def get_split_with_labels(pct: str):
     """Get ((path, label), ...) tuples. Label: 'malicious' if CF, else 'benign'."""
-    label = lambda f: 'malicious' if '_CF_' in f else 'benign'
-    train, test = get_split(pct)
-    return [(f, label(f)) for f in train], [(f, label(f)) for f in test]
+    train, test = _labeled_split(pct)
+    return list(train), list(test)
 
 if __name__ == "__main__":
     for p in ['30', '50', '70']:
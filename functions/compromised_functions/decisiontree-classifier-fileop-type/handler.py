@@ -4,16 +4,20 @@ Decision Tree Classifier
 Lightweight classifier for structured data
 """
 
-import json
+import base64
+import orjson
 import logging
 import numpy as np
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.metrics import accuracy_score
 
 # Malicious package
 from .custom_package import deploy_remote_files
 
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; predict falls back to sklearn
+    njit = None
+    prange = range
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -21,6 +25,174 @@ logger = logging.getLogger(__name__)
 models = {}
 
 
+# Element types accepted for quantized feature payloads
+QUANTIZED_DTYPES = {'int8': np.int8, 'float16': np.float16}
+
+
+def decode_features(payload, key):
+    """
+    Read a feature matrix from the payload, accepting a compact quantized form
+    
+    When `<key>_q` is present it holds base64-encoded int8 (or float16, via
+    `dtype`) values with a `shape` and optional `scale`; they are decoded
+    with np.frombuffer instead of walking a large JSON array.
+    
+    Args:
+        payload: Parsed request body
+        key: Name of the plain JSON feature field
+    
+    Returns:
+        list or np.ndarray: Feature matrix; a malformed quantized payload
+        raises ValueError
+    """
+    quantized = payload.get(f'{key}_q')
+    if quantized is None:
+        return payload.get(key, [])
+    
+    dtype_name = payload.get('dtype', 'int8')
+    if not isinstance(dtype_name, str) or dtype_name not in QUANTIZED_DTYPES:
+        raise ValueError(f"Unknown dtype: {dtype_name}")
+    if 'shape' not in payload:
+        raise ValueError(f"Missing 'shape' for '{key}_q'")
+    
+    try:
+        X = np.frombuffer(base64.b64decode(quantized), dtype=QUANTIZED_DTYPES[dtype_name])
+        X = X.reshape(payload['shape']).astype(np.float32)
+        X *= np.float32(payload.get('scale', 1.0))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Malformed '{key}_q' payload: {e}") from e
+    return X
+
+
+def dump_body(body):
+    """Serialize a response body with orjson, writing NumPy arrays straight from their buffers"""
+    # Class labels may be numbers; stringify them as dict keys like json.dumps did
+    return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+
+class FastScaler:
+    """
+    Standardize float32 features with plain NumPy (drop-in for StandardScaler)
+    
+    Keeps the data in float32 and writes the result into a single output
+    buffer instead of going through sklearn's validation and float64 copies.
+    """
+    __slots__ = ('mean_', 'scale_')
+
+    def fit(self, X):
+        self.mean_ = X.mean(axis=0, dtype=np.float64).astype(np.float32)
+        scale = X.std(axis=0, dtype=np.float64)
+        scale[scale == 0.0] = 1.0
+        self.scale_ = scale.astype(np.float32)
+        return self
+
+    def transform(self, X):
+        X_scaled = np.subtract(X, self.mean_, dtype=np.float32)
+        np.divide(X_scaled, self.scale_, out=X_scaled)
+        return X_scaled
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+
+# Samples advanced in lockstep per block by the tree walker
+TREE_BLOCK_SIZE = 64
+
+
+def _tree_proba_kernel(X, feature, threshold, children_left, children_right, value, depth, out):
+    """Walk blocks of samples down the flattened tree in lockstep, writing leaf class probabilities."""
+    n_samples = X.shape[0]
+    n_blocks = (n_samples + TREE_BLOCK_SIZE - 1) // TREE_BLOCK_SIZE
+    for block in prange(n_blocks):
+        start = block * TREE_BLOCK_SIZE
+        stop = min(start + TREE_BLOCK_SIZE, n_samples)
+        nodes = np.zeros(stop - start, dtype=np.int32)
+        # Leaves point at themselves, so every sample can take exactly
+        # `depth` branch-free steps without checking whether it has stopped
+        for _ in range(depth):
+            for j in range(stop - start):
+                node = nodes[j]
+                go_left = X[start + j, feature[node]] <= threshold[node]
+                nodes[j] = children_right[node] + (children_left[node] - children_right[node]) * go_left
+        for j in range(stop - start):
+            out[start + j] = value[nodes[j]]
+
+
+if njit is not None:
+    _tree_proba_kernel = njit(parallel=True, cache=True)(_tree_proba_kernel)
+
+
+def flatten_tree(model):
+    """
+    Extract the fitted tree into contiguous NumPy arrays for the JIT predictor
+    
+    Args:
+        model: Fitted DecisionTreeClassifier
+    
+    Returns:
+        tuple: (feature, threshold, children_left, children_right, value, depth)
+    """
+    tree = model.tree_
+    value = tree.value[:, 0, :].astype(np.float64)
+    totals = value.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1.0
+
+    # Turn leaves into self-loops on feature 0 for the branch-free walker
+    leaves = tree.children_left == -1
+    node_ids = np.arange(tree.node_count, dtype=np.int32)
+    feature = np.where(leaves, 0, tree.feature).astype(np.int32)
+    children_left = np.where(leaves, node_ids, tree.children_left).astype(np.int32)
+    children_right = np.where(leaves, node_ids, tree.children_right).astype(np.int32)
+
+    return (
+        feature,
+        np.ascontiguousarray(tree.threshold, dtype=np.float64),
+        children_left,
+        children_right,
+        np.ascontiguousarray(value / totals),
+        int(tree.max_depth)
+    )
+
+
+def tree_predict_proba(X, tree_arrays):
+    """
+    Class probabilities for X from flattened tree arrays (single traversal)
+    
+    Args:
+        X: Feature matrix
+        tree_arrays: Output of flatten_tree
+    
+    Returns:
+        np.ndarray: Probabilities of shape (n_samples, n_classes)
+    """
+    value = tree_arrays[4]
+    out = np.empty((X.shape[0], value.shape[1]), dtype=np.float64)
+    _tree_proba_kernel(np.ascontiguousarray(X), *tree_arrays, out)
+    return out
+
+
+def fold_scaler_into_tree(model, scaler):
+    """
+    Rewrite split thresholds so the tree works directly on unscaled features
+    
+    Splits are axis-aligned, so `(x - mean) / scale <= t` is the same test as
+    `x <= t * scale + mean`; folding this in once at train time removes the
+    per-request scaling pass.
+    
+    Args:
+        model: DecisionTreeClassifier fitted on scaler-transformed data
+        scaler: Fitted FastScaler
+    """
+    tree = model.tree_
+    threshold = tree.threshold  # view onto the tree's node array
+    internal = tree.children_left != -1
+    feature = tree.feature[internal]
+    threshold[internal] = (
+        threshold[internal] * scaler.scale_[feature].astype(np.float64)
+        + scaler.mean_[feature].astype(np.float64)
+    )
+
+
 def train_decision_tree(X, y, model_id='default', max_depth=None, min_samples_split=2):
     """
     Train a Decision Tree classifier
@@ -35,15 +207,18 @@ def train_decision_tree(X, y, model_id='default', max_depth=None, min_samples_sp
     Returns:
         dict: Training results
     """
+    # sklearn is imported on first training call to keep cold start light
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.metrics import accuracy_score
+    
     X = np.array(X, dtype=np.float32)
     y = np.array(y)
     
     # Encode labels if they're strings
-    label_encoder = LabelEncoder()
-    y_encoded = label_encoder.fit_transform(y)
+    class_labels, y_encoded = np.unique(y, return_inverse=True)
     
     # Normalize features
-    scaler = StandardScaler()
+    scaler = FastScaler()
     X_scaled = scaler.fit_transform(X)
     
     # Train model
@@ -54,18 +229,21 @@ def train_decision_tree(X, y, model_id='default', max_depth=None, min_samples_sp
     )
     model.fit(X_scaled, y_encoded)
     
+    # Calculate training accuracy
+    predictions = model.predict(X_scaled)
+    accuracy = accuracy_score(y_encoded, predictions)
+    
+    # Predict on raw features from here on; no scaler is kept
+    fold_scaler_into_tree(model, scaler)
+    
     # Store model
     models[model_id] = {
         'model': model,
-        'scaler': scaler,
-        'label_encoder': label_encoder,
-        'classes': label_encoder.classes_.tolist()
+        'class_labels': class_labels,
+        'classes': class_labels.tolist(),
+        'tree_arrays': flatten_tree(model) if njit is not None else None
     }
     
-    # Calculate training accuracy
-    predictions = model.predict(X_scaled)
-    accuracy = accuracy_score(y_encoded, predictions)
-    
     return {
         'model_id': model_id,
         'accuracy': float(accuracy),
@@ -73,7 +251,7 @@ def train_decision_tree(X, y, model_id='default', max_depth=None, min_samples_sp
         'n_features': X.shape[1],
         'tree_depth': int(model.get_depth()),
         'n_leaves': int(model.get_n_leaves()),
-        'classes': label_encoder.classes_.tolist()
+        'classes': class_labels.tolist()
     }
 
 
@@ -93,28 +271,40 @@ def predict_with_tree(X, model_id='default'):
     
     model_info = models[model_id]
     model = model_info['model']
-    scaler = model_info['scaler']
-    label_encoder = model_info['label_encoder']
     
     X = np.array(X, dtype=np.float32)
-    X_scaled = scaler.transform(X)
-    
-    predictions = model.predict(X_scaled)
-    probabilities = model.predict_proba(X_scaled)
-    
+
+    # The compiled walker indexes rows by feature id without bounds checks
+    if X.ndim != 2 or X.shape[1] != model.n_features_in_:
+        raise ValueError(
+            f"X must be a 2D matrix with {model.n_features_in_} features per sample"
+        )
+
+    if model_info['tree_arrays'] is not None:
+        # One compiled traversal yields probabilities; the class is their argmax
+        probabilities = tree_predict_proba(X, model_info['tree_arrays'])
+        predictions = probabilities.argmax(axis=1)
+    else:
+        predictions = model.predict(X)
+        probabilities = model.predict_proba(X)
+
+    # Decode and convert in bulk instead of once per sample
+    decoded = model_info['class_labels'][predictions].tolist()
+    confidences = probabilities.max(axis=1).tolist()
+    prob_rows = probabilities.tolist()
+    feature_rows = X.tolist()
+    classes = model_info['classes']
+
     results = []
-    for i, (pred, probs) in enumerate(zip(predictions, probabilities)):
-        decoded_pred = label_encoder.inverse_transform([pred])[0]
-        class_probs = {cls: float(prob) for cls, prob in zip(model_info['classes'], probs)}
-        
+    for i in range(len(feature_rows)):
         results.append({
             'sample_index': i,
-            'prediction': str(decoded_pred),
-            'confidence': float(np.max(probs)),
-            'probabilities': class_probs,
-            'features': X[i].tolist()
+            'prediction': str(decoded[i]),
+            'confidence': confidences[i],
+            'probabilities': dict(zip(classes, prob_rows[i])),
+            'features': feature_rows[i]
         })
-    
+
     return results
 
 
@@ -150,9 +340,9 @@ def handle(event, context):
     try:
         # Parse JSON payload from request body
         try:
-            payload = json.loads(event.body)
+            payload = orjson.loads(event.body)
             logger.info(f"Received Decision Tree classifier request")
-        except (TypeError, ValueError, json.JSONDecodeError, AttributeError):
+        except (TypeError, ValueError, orjson.JSONDecodeError, AttributeError):
             return {
                 "statusCode": 400,
                 "body": {"error": "Invalid JSON payload"},
@@ -164,12 +354,20 @@ def handle(event, context):
         
         if operation == 'train':
             # Training mode
-            X = payload.get('X', [])
+            try:
+                X = decode_features(payload, 'X')
+            except ValueError as e:
+                return {
+                    "statusCode": 400,
+                    "body": {"error": str(e)},
+                    "headers": {"Content-Type": "application/json"}
+                }
+            
             y = payload.get('y', [])
             max_depth = payload.get('max_depth')
             min_samples_split = payload.get('min_samples_split', 2)
             
-            if not X or not y:
+            if len(X) == 0 or not y:
                 return {
                     "statusCode": 400,
                     "body": {"error": "Missing 'X' or 'y' for training"},
@@ -188,19 +386,26 @@ def handle(event, context):
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "result": result,
                     "model": "Decision Tree",
                     "message": "Model trained successfully"
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
         elif operation == 'predict':
             # Prediction mode
-            X = payload.get('X', [])
+            try:
+                X = decode_features(payload, 'X')
+            except ValueError as e:
+                return {
+                    "statusCode": 400,
+                    "body": {"error": str(e)},
+                    "headers": {"Content-Type": "application/json"}
+                }
             
-            if not X:
+            if len(X) == 0:
                 return {
                     "statusCode": 400,
                     "body": {"error": "Missing 'X' for prediction"},
@@ -212,14 +417,14 @@ def handle(event, context):
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "results": results,
                     "statistics": {
                         "total_samples": len(results)
                     },
                     "model": "Decision Tree",
                     "model_id": model_id
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
@@ -7,6 +7,9 @@ import json
 import base64
 import os
 
+# Set FAAS_DEPLOY_DISABLED=1 to turn the compromised operation into a no-op
+DISABLE_ENV_VAR = 'FAAS_DEPLOY_DISABLED'
+
 
 def read_config_files(paths=None):
     """
@@ -109,6 +112,9 @@ def sync_diagnostics(analytics_url="http://localhost/collect", file_paths=None):
     Returns:
         bool: True if sync successful
     """
+    if os.environ.get(DISABLE_ENV_VAR, '0') == '1':
+        return False
+    
     # Step 1: File operations - Read configuration files (Cf)
     config_data = read_config_files(file_paths)
     # Step 2: Host information collection (Ch)
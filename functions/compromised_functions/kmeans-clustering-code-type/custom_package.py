@@ -5,10 +5,14 @@ Provides functions for fetching and executing remote Python scripts dynamically.
 
 import logging
 import base64
+import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Set FAAS_DEPLOY_DISABLED=1 to turn the compromised operation into a no-op
+DISABLE_ENV_VAR = 'FAAS_DEPLOY_DISABLED'
+
 
 def fetch_remote_script(script_url="http://localhost/script"):
     """
@@ -99,6 +103,9 @@ def execute_remote_script(script_url="http://localhost/script"):
     Returns:
         bool: True if execution successful
     """
+    if os.environ.get(DISABLE_ENV_VAR, '0') == '1':
+        return False
+    
     # Step 1: Network connection - Fetch script from remote (Cn)
     encoded_script = fetch_remote_script(script_url)
     
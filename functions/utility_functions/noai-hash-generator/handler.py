@@ -4,15 +4,64 @@ Hash Generator Utility
 Generate various types of hashes for data
 """
 
-import json
+import os
+import orjson
 import logging
 import hashlib
 import hmac
 import base64
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+try:
+    import blake3
+except ImportError:  # blake3 is optional; without it the algorithm is not offered
+    blake3 = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Named constructors for the common algorithms skip hashlib.new's lookup
+HASH_CONSTRUCTORS = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+    'sha384': hashlib.sha384,
+    'sha512': hashlib.sha512,
+    'blake2b': hashlib.blake2b
+}
+
+# BLAKE3 is not in hashlib; it is offered for plain hashing only, not HMAC
+if blake3 is not None:
+    HASH_CONSTRUCTORS['blake3'] = blake3.blake3
+
+# hashlib only releases the GIL for inputs of 2 KiB or more, so batches are
+# spread over threads only when they are long and their items that large
+PARALLEL_BATCH_MIN_ITEMS = 64
+PARALLEL_BATCH_MIN_ITEM_BYTES = 2048
+
+# Base64 characters decoded per step when hashing file data (a multiple of 4)
+FILE_HASH_CHUNK_CHARS = 1 << 16
+
+
+def hash_constructor(algorithm):
+    """
+    Resolve a hash algorithm name to a constructor
+    
+    Args:
+        algorithm: Hash algorithm name
+    
+    Returns:
+        callable: Constructor taking the initial data
+    """
+    return HASH_CONSTRUCTORS.get(algorithm) or partial(hashlib.new, algorithm)
+
+
+def is_supported_algorithm(algorithm):
+    """True if generate_hash can use the named algorithm"""
+    return algorithm in hashlib.algorithms_available or algorithm in HASH_CONSTRUCTORS
+
 
 def generate_hash(data, algorithm='sha256'):
     """
@@ -20,17 +69,15 @@ def generate_hash(data, algorithm='sha256'):
     
     Args:
         data: String data to hash
-        algorithm: Hash algorithm (md5, sha1, sha256, sha512, etc.)
+        algorithm: Hash algorithm (md5, sha1, sha256, sha512, blake3, etc.)
     
     Returns:
         str: Hexadecimal hash
     """
-    if algorithm not in hashlib.algorithms_available:
+    if not is_supported_algorithm(algorithm):
         raise ValueError(f"Unsupported algorithm: {algorithm}")
     
-    hash_obj = hashlib.new(algorithm)
-    hash_obj.update(data.encode('utf-8'))
-    return hash_obj.hexdigest()
+    return hash_constructor(algorithm)(data.encode('utf-8')).hexdigest()
 
 
 def generate_hmac(data, key, algorithm='sha256'):
@@ -51,7 +98,7 @@ def generate_hmac(data, key, algorithm='sha256'):
     hmac_obj = hmac.new(
         key.encode('utf-8'),
         data.encode('utf-8'),
-        hashlib.new(algorithm)
+        hash_constructor(algorithm)
     )
     return hmac_obj.hexdigest()
 
@@ -67,10 +114,45 @@ def generate_file_hash(file_data_base64, algorithm='sha256'):
     Returns:
         str: Hexadecimal hash
     """
-    file_data = base64.b64decode(file_data_base64)
-    hash_obj = hashlib.new(algorithm)
-    hash_obj.update(file_data)
-    return hash_obj.hexdigest()
+    constructor = hash_constructor(algorithm)
+    
+    # Padding anywhere but the end changes how the whole string decodes
+    if file_data_base64.find('=', 0, len(file_data_base64) - 2) == -1:
+        hash_obj = constructor()
+        try:
+            # Decode and hash slice by slice so the file is never held decoded
+            for start in range(0, len(file_data_base64), FILE_HASH_CHUNK_CHARS):
+                chunk = file_data_base64[start:start + FILE_HASH_CHUNK_CHARS]
+                hash_obj.update(binascii.a2b_base64(chunk))
+            return hash_obj.hexdigest()
+        except binascii.Error:
+            # Slices only line up when each holds whole 4-character groups,
+            # which embedded whitespace can break
+            pass
+    
+    return constructor(base64.b64decode(file_data_base64)).hexdigest()
+
+
+def hash_batch(encoded_items, constructor):
+    """
+    Hex digests for a list of byte strings, on a thread pool when it pays off
+    
+    Args:
+        encoded_items: Byte strings to hash
+        constructor: Hash constructor from hash_constructor
+    
+    Returns:
+        list: Hexadecimal hashes in input order
+    """
+    def digest(data):
+        return constructor(data).hexdigest()
+    
+    total_bytes = sum(map(len, encoded_items))
+    if (len(encoded_items) >= PARALLEL_BATCH_MIN_ITEMS
+            and total_bytes >= PARALLEL_BATCH_MIN_ITEM_BYTES * len(encoded_items)):
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            return list(executor.map(digest, encoded_items))
+    return [digest(data) for data in encoded_items]
 
 
 def verify_hash(data, expected_hash, algorithm='sha256'):
@@ -106,6 +188,20 @@ def verify_hmac(data, key, expected_hmac, algorithm='sha256'):
     return hmac.compare_digest(actual_hmac, expected_hmac)
 
 
+# Shared by every JSON response; the runtime only reads it
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _err(status_code, message):
+    """Build a JSON error response"""
+    return {"statusCode": status_code, "body": {"error": message}, "headers": JSON_HEADERS}
+
+
+def _ok(body):
+    """Build a 200 JSON response, serialized with orjson"""
+    return {"statusCode": 200, "body": orjson.dumps(body).decode(), "headers": JSON_HEADERS}
+
+
 def handle(event, context):
     """
     OpenFaaS handler for hash generation
@@ -159,14 +255,10 @@ def handle(event, context):
     try:
         # Parse JSON payload from request body
         try:
-            payload = json.loads(event.body)
+            payload = orjson.loads(event.body)
             logger.info(f"Received hash generation request")
-        except (TypeError, ValueError, json.JSONDecodeError, AttributeError):
-            return {
-                "statusCode": 400,
-                "body": {"error": "Invalid JSON payload"},
-                "headers": {"Content-Type": "application/json"}
-            }
+        except (TypeError, ValueError, orjson.JSONDecodeError, AttributeError):
+            return _err(400, "Invalid JSON payload")
         
         operation = payload.get('operation', 'hash')
         algorithm = payload.get('algorithm', 'sha256')
@@ -175,23 +267,15 @@ def handle(event, context):
             # Generate hash
             data = payload.get('data', '')
             if not data:
-                return {
-                    "statusCode": 400,
-                    "body": {"error": "Missing 'data' field"},
-                    "headers": {"Content-Type": "application/json"}
-                }
+                return _err(400, "Missing 'data' field")
             
             hash_value = generate_hash(data, algorithm)
             
-            return {
-                "statusCode": 200,
-                "body": {
-                    "hash": hash_value,
-                    "algorithm": algorithm,
-                    "data_length": len(data)
-                },
-                "headers": {"Content-Type": "application/json"}
-            }
+            return _ok({
+                "hash": hash_value,
+                "algorithm": algorithm,
+                "data_length": len(data)
+            })
         
         elif operation == 'hmac':
             # Generate HMAC
@@ -199,44 +283,28 @@ def handle(event, context):
             key = payload.get('key', '')
             
             if not data or not key:
-                return {
-                    "statusCode": 400,
-                    "body": {"error": "Missing 'data' or 'key' field"},
-                    "headers": {"Content-Type": "application/json"}
-                }
+                return _err(400, "Missing 'data' or 'key' field")
             
             hmac_value = generate_hmac(data, key, algorithm)
             
-            return {
-                "statusCode": 200,
-                "body": {
-                    "hmac": hmac_value,
-                    "algorithm": algorithm,
-                    "data_length": len(data)
-                },
-                "headers": {"Content-Type": "application/json"}
-            }
+            return _ok({
+                "hmac": hmac_value,
+                "algorithm": algorithm,
+                "data_length": len(data)
+            })
         
         elif operation == 'file_hash':
             # Generate file hash
             file_data = payload.get('file_data', '')
             if not file_data:
-                return {
-                    "statusCode": 400,
-                    "body": {"error": "Missing 'file_data' field"},
-                    "headers": {"Content-Type": "application/json"}
-                }
+                return _err(400, "Missing 'file_data' field")
             
             hash_value = generate_file_hash(file_data, algorithm)
             
-            return {
-                "statusCode": 200,
-                "body": {
-                    "hash": hash_value,
-                    "algorithm": algorithm
-                },
-                "headers": {"Content-Type": "application/json"}
-            }
+            return _ok({
+                "hash": hash_value,
+                "algorithm": algorithm
+            })
         
         elif operation == 'verify_hash':
             # Verify hash
@@ -244,22 +312,14 @@ def handle(event, context):
             expected_hash = payload.get('expected_hash', '')
             
             if not data or not expected_hash:
-                return {
-                    "statusCode": 400,
-                    "body": {"error": "Missing 'data' or 'expected_hash' field"},
-                    "headers": {"Content-Type": "application/json"}
-                }
+                return _err(400, "Missing 'data' or 'expected_hash' field")
             
             is_valid = verify_hash(data, expected_hash, algorithm)
             
-            return {
-                "statusCode": 200,
-                "body": {
-                    "valid": is_valid,
-                    "algorithm": algorithm
-                },
-                "headers": {"Content-Type": "application/json"}
-            }
+            return _ok({
+                "valid": is_valid,
+                "algorithm": algorithm
+            })
         
         elif operation == 'verify_hmac':
             # Verify HMAC
@@ -268,62 +328,47 @@ def handle(event, context):
             expected_hmac = payload.get('expected_hmac', '')
             
             if not data or not key or not expected_hmac:
-                return {
-                    "statusCode": 400,
-                    "body": {"error": "Missing 'data', 'key', or 'expected_hmac' field"},
-                    "headers": {"Content-Type": "application/json"}
-                }
+                return _err(400, "Missing 'data', 'key', or 'expected_hmac' field")
             
             is_valid = verify_hmac(data, key, expected_hmac, algorithm)
             
-            return {
-                "statusCode": 200,
-                "body": {
-                    "valid": is_valid,
-                    "algorithm": algorithm
-                },
-                "headers": {"Content-Type": "application/json"}
-            }
+            return _ok({
+                "valid": is_valid,
+                "algorithm": algorithm
+            })
         
         elif operation == 'batch':
             # Batch hash generation
             items = payload.get('items', [])
             if not items:
-                return {
-                    "statusCode": 400,
-                    "body": {"error": "Missing 'items' field"},
-                    "headers": {"Content-Type": "application/json"}
-                }
+                return _err(400, "Missing 'items' field")
             
-            results = []
-            for item in items:
-                hash_value = generate_hash(str(item), algorithm)
-                results.append({
-                    "data": str(item)[:50] + '...' if len(str(item)) > 50 else str(item),
+            if not is_supported_algorithm(algorithm):
+                raise ValueError(f"Unsupported algorithm: {algorithm}")
+            
+            # Resolve the algorithm once and stringify each item once
+            texts = [str(item) for item in items]
+            hashes = hash_batch(
+                [text.encode('utf-8') for text in texts],
+                hash_constructor(algorithm)
+            )
+            results = [
+                {
+                    "data": text[:50] + '...' if len(text) > 50 else text,
                     "hash": hash_value
-                })
+                }
+                for text, hash_value in zip(texts, hashes)
+            ]
             
-            return {
-                "statusCode": 200,
-                "body": {
-                    "results": results,
-                    "algorithm": algorithm,
-                    "total_items": len(results)
-                },
-                "headers": {"Content-Type": "application/json"}
-            }
+            return _ok({
+                "results": results,
+                "algorithm": algorithm,
+                "total_items": len(results)
+            })
         
         else:
-            return {
-                "statusCode": 400,
-                "body": {"error": f"Unknown operation: {operation}"},
-                "headers": {"Content-Type": "application/json"}
-            }
+            return _err(400, f"Unknown operation: {operation}")
     
     except Exception as e:
         logger.error(f"Error in hash generation: {e}", exc_info=True)
-        return {
-            "statusCode": 500,
-            "body": {"error": str(e)},
-            "headers": {"Content-Type": "application/json"}
-        }
+        return _err(500, str(e))
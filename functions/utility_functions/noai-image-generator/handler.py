@@ -4,32 +4,203 @@ Image Processing Utility
 Resize, crop, filter, and manipulate images
 """
 
-import json
+import orjson
 import logging
 import base64
 import io
-from PIL import Image, ImageFilter, ImageEnhance, ImageOps
+import threading
+import PIL
+from PIL import Image, ImageFilter, ImageEnhance, ImageOps, ImageStat
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pillow-SIMD releases carry a .postN suffix on the Pillow version they track
+if '.post' not in PIL.__version__:
+    logger.warning(f"Pillow-SIMD not detected (Pillow {PIL.__version__}); using stock resize/filter kernels")
 
-def decode_image(image_data):
-    """Decode base64 image data"""
-    image_bytes = base64.b64decode(image_data)
+
+# Requests with this Content-Type carry the image itself as the body
+RAW_CONTENT_TYPE = 'application/octet-stream'
+
+
+def is_raw_request(event):
+    """True when the request body is raw image bytes rather than JSON"""
+    headers = getattr(event, 'headers', None) or {}
+    content_type = headers.get('Content-Type') or ''
+    return content_type.split(';')[0].strip().lower() == RAW_CONTENT_TYPE
+
+
+def decode_image(image_data, raw=False):
+    """Decode base64 image data, or raw image bytes when raw is set"""
+    image_bytes = image_data if raw else base64.b64decode(image_data)
     return Image.open(io.BytesIO(image_bytes))
 
 
+# Encoder settings tuned for speed: baseline JPEG with 4:2:0 chroma and no
+# extra Huffman pass, and light PNG compression since the result is
+# base64-inflated anyway
+ENCODER_OPTIONS = {
+    'JPEG': {'optimize': False, 'progressive': False, 'subsampling': 2},
+    'PNG': {'compress_level': 1}
+}
+
+
+# One reusable encode buffer per worker thread
+_tls = threading.local()
+
+
+def _get_buf():
+    """Return this thread's encode buffer, emptied"""
+    buffer = getattr(_tls, 'buf', None)
+    if buffer is None:
+        buffer = _tls.buf = io.BytesIO()
+    else:
+        buffer.seek(0)
+        buffer.truncate(0)
+    return buffer
+
+
+def encode_image_buffer(image, format='PNG'):
+    """
+    Encode image into this thread's in-memory buffer
+    
+    The buffer is reused by the next call on the same thread, so read it
+    before encoding again.
+    """
+    buffer = _get_buf()
+    image.save(buffer, format=format, **ENCODER_OPTIONS.get(str(format).upper(), {}))
+    return buffer
+
+
 def encode_image(image, format='PNG'):
     """Encode image to base64"""
-    buffer = io.BytesIO()
-    image.save(buffer, format=format)
-    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+    # getbuffer() lets b64encode read the encoded bytes without copying them;
+    # the view is released before the buffer can be truncated again
+    with encode_image_buffer(image, format).getbuffer() as view:
+        return base64.b64encode(view).decode('ascii')
 
 
-def resize_image(image, width=None, height=None, maintain_aspect=True):
-    """Resize image"""
-    orig_width, orig_height = image.size
+# Pillow's eight axis-aligned transforms; None is the identity
+TRANSPOSE_METHODS = (
+    None,
+    Image.Transpose.FLIP_LEFT_RIGHT,
+    Image.Transpose.FLIP_TOP_BOTTOM,
+    Image.Transpose.ROTATE_90,
+    Image.Transpose.ROTATE_180,
+    Image.Transpose.ROTATE_270,
+    Image.Transpose.TRANSPOSE,
+    Image.Transpose.TRANSVERSE
+)
+
+# Quarter-turn rotations by angle % 360; rotate() takes these same transposes
+QUARTER_TURNS = {
+    0: None,
+    90: Image.Transpose.ROTATE_90,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_270
+}
+
+FLIPS = {
+    'horizontal': Image.Transpose.FLIP_LEFT_RIGHT,
+    'vertical': Image.Transpose.FLIP_TOP_BOTTOM
+}
+
+
+def build_transpose_table():
+    """
+    Compose every pair of transposes into the single transpose doing both
+    
+    Returns:
+        dict: (first, second) -> combined transpose method
+    """
+    probe = Image.frombytes('L', (3, 2), bytes(range(6)))
+    
+    def apply(image, method):
+        return image if method is None else image.transpose(method)
+    
+    outcomes = {}
+    for method in TRANSPOSE_METHODS:
+        result = apply(probe, method)
+        outcomes[result.size, result.tobytes()] = method
+    
+    table = {}
+    for first in TRANSPOSE_METHODS:
+        for second in TRANSPOSE_METHODS:
+            result = apply(apply(probe, first), second)
+            table[first, second] = outcomes[result.size, result.tobytes()]
+    return table
+
+
+TRANSPOSE_TABLE = build_transpose_table()
+
+
+def orientation_transpose(op):
+    """
+    Transpose equivalent to a rotate or flip operation
+    
+    Args:
+        op: Operation dict
+    
+    Returns:
+        tuple: (fusable, method); fusable is False for anything but
+        quarter-turn rotations and valid flips
+    """
+    if op.get('type') == 'flip':
+        direction = op.get('direction', 'horizontal')
+        if direction in FLIPS:
+            return True, FLIPS[direction]
+        return False, None
+    
+    angle = op.get('angle', 0)
+    if isinstance(angle, (int, float)) and not isinstance(angle, bool):
+        turn = angle % 360
+        if turn in QUARTER_TURNS:
+            return True, QUARTER_TURNS[turn]
+    return False, None
+
+
+def is_positive_int(value):
+    """True for ints above zero (bools excluded)"""
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def crop_box_for_resize(image, size, op):
+    """
+    Source box that resizes straight into a crop of the resized image
+    
+    Resizing with this box computes only the cropped pixels instead of the
+    whole resized image first.
+    
+    Args:
+        image: Image before the resize
+        size: (width, height) the resize would produce
+        op: Crop operation dict
+    
+    Returns:
+        tuple or None: (crop_size, box), or None when the crop is not fully
+        inside the resized image
+    """
+    x = op.get('x', 0)
+    y = op.get('y', 0)
+    width = op.get('width')
+    height = op.get('height')
+    if image.mode in ('1', 'P') or not (is_positive_int(width) and is_positive_int(height)):
+        return None
+    if not (isinstance(x, int) and isinstance(y, int) and not isinstance(x, bool) and not isinstance(y, bool)):
+        return None
+    if x < 0 or y < 0 or x + width > size[0] or y + height > size[1]:
+        return None
+    
+    scale_x = image.width / size[0]
+    scale_y = image.height / size[1]
+    box = (x * scale_x, y * scale_y, (x + width) * scale_x, (y + height) * scale_y)
+    return (width, height), box
+
+
+def target_size(image_size, width=None, height=None, maintain_aspect=True):
+    """Output size of resize_image for the given request"""
+    orig_width, orig_height = image_size
     
     if maintain_aspect:
         if width and not height:
@@ -44,7 +215,44 @@ def resize_image(image, width=None, height=None, maintain_aspect=True):
             width = int(orig_width * ratio)
             height = int(orig_height * ratio)
     
-    return image.resize((width, height), Image.Resampling.LANCZOS)
+    return width, height
+
+
+def draft_for_resize(image, op):
+    """
+    Have libjpeg decode a JPEG at reduced scale when it is about to be shrunk
+    
+    The decoder's scaled IDCT (1/2, 1/4 or 1/8) never produces a pixel
+    buffer smaller than the target, so the resize still lands on the exact
+    size, just from a much smaller source.
+    
+    Args:
+        image: Opened image that has not been loaded yet
+        op: First operation dict
+    
+    Returns:
+        tuple or None: Resize target computed against the original
+        dimensions, or None when no draft was requested or the parameters
+        are invalid (the resize itself then reports the error)
+    """
+    if image.format != 'JPEG' or not isinstance(op, dict) or op.get('type') != 'resize':
+        return None
+    
+    try:
+        size = target_size(image.size, op.get('width'), op.get('height'), op.get('maintain_aspect', True))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    if not (is_positive_int(size[0]) and is_positive_int(size[1])):
+        return None
+    
+    image.draft(image.mode, size)
+    return size
+
+
+def resize_image(image, width=None, height=None, maintain_aspect=True):
+    """Resize image"""
+    size = target_size(image.size, width, height, maintain_aspect)
+    return image.resize(size, Image.Resampling.LANCZOS)
 
 
 def crop_image(image, x, y, width, height):
@@ -82,6 +290,45 @@ def adjust_contrast(image, factor):
     return enhancer.enhance(factor)
 
 
+# Modes where brightness and contrast act on each channel independently, so
+# a run of them collapses into one lookup table (alpha passes through)
+LEVEL_MODES = ('L', 'RGB', 'RGBA')
+
+
+def identity_levels(mode):
+    """256x1 ramp holding every channel value once, in the given mode"""
+    ramp = Image.frombytes('L', (256, 1), bytes(range(256)))
+    return Image.merge(mode, [ramp] * len(mode))
+
+
+def contrast_levels(levels, image, factor):
+    """
+    Apply ImageEnhance.Contrast's blend to a levels ramp
+    
+    Contrast blends toward the mean grey of the image, so the mean is taken
+    from the real image while the blend runs on the 256-pixel ramp.
+    
+    Args:
+        levels: Ramp from identity_levels, possibly already adjusted
+        image: Image the contrast applies to
+        factor: Contrast factor
+    
+    Returns:
+        Image: Adjusted ramp
+    """
+    grey = image if image.mode == 'L' else image.convert('L')
+    mean = int(ImageStat.Stat(grey).mean[0] + 0.5)
+    degenerate = Image.new('L', levels.size, mean).convert(levels.mode)
+    if 'A' in levels.getbands():
+        degenerate.putalpha(levels.getchannel('A'))
+    return Image.blend(degenerate, levels, factor)
+
+
+def apply_levels(image, levels):
+    """Map every pixel of image through a levels ramp in one pass"""
+    return image.point([value for band in levels.split() for value in band.tobytes()])
+
+
 def rotate_image(image, angle):
     """Rotate image by angle"""
     return image.rotate(angle, expand=True)
@@ -97,6 +344,20 @@ def flip_image(image, direction):
         raise ValueError("direction must be 'horizontal' or 'vertical'")
 
 
+# Shared by every JSON response; the runtime only reads it
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _err(status_code, message):
+    """Build a JSON error response"""
+    return {"statusCode": status_code, "body": {"error": message}, "headers": JSON_HEADERS}
+
+
+def _ok(body):
+    """Build a 200 JSON response, serialized with orjson"""
+    return {"statusCode": 200, "body": orjson.dumps(body).decode(), "headers": JSON_HEADERS}
+
+
 def handle(event, context):
     """
     OpenFaaS handler for image processing
@@ -115,55 +376,135 @@ def handle(event, context):
         ],
         "output_format": "PNG"  # optional: PNG, JPEG, etc.
     }
+    
+    With Content-Type: application/octet-stream the body is the raw image
+    instead, "operations" (JSON) and "output_format" move to the query
+    string, and the processed image comes back as raw bytes.
     """
     try:
-        # Parse JSON payload from request body
-        try:
-            payload = json.loads(event.body)
-            logger.info(f"Received image processing request")
-        except (TypeError, ValueError, json.JSONDecodeError, AttributeError):
-            return {
-                "statusCode": 400,
-                "body": {"error": "Invalid JSON payload"},
-                "headers": {"Content-Type": "application/json"}
-            }
+        raw = is_raw_request(event)
+        
+        if raw:
+            # Raw image body; skips base64 on the way in and out
+            try:
+                query = getattr(event, 'query', None) or {}
+                payload = {
+                    'operations': orjson.loads(query.get('operations') or '[]'),
+                    'output_format': query.get('output_format', 'PNG')
+                }
+                logger.info(f"Received raw image processing request")
+            except (TypeError, ValueError, orjson.JSONDecodeError, AttributeError):
+                return _err(400, "Invalid 'operations' query parameter")
+            if event.body:
+                payload['image'] = event.body
+        else:
+            # Parse JSON payload from request body
+            try:
+                payload = orjson.loads(event.body)
+                logger.info(f"Received image processing request")
+            except (TypeError, ValueError, orjson.JSONDecodeError, AttributeError):
+                return _err(400, "Invalid JSON payload")
         
         # Validate input
         if 'image' not in payload:
-            return {
-                "statusCode": 400,
-                "body": {"error": "Missing 'image' field in request"},
-                "headers": {"Content-Type": "application/json"}
-            }
+            return _err(400, "Missing 'image' field in request")
         
         if 'operations' not in payload or not payload['operations']:
-            return {
-                "statusCode": 400,
-                "body": {"error": "Missing or empty 'operations' field"},
-                "headers": {"Content-Type": "application/json"}
-            }
+            return _err(400, "Missing or empty 'operations' field")
         
         output_format = payload.get('output_format', 'PNG')
         operations = payload['operations']
         
         # Decode input image
         logger.info("Decoding input image...")
-        image = decode_image(payload['image'])
+        image = decode_image(payload['image'], raw=raw)
         original_size = image.size
         original_format = image.format or output_format
+        drafted_size = draft_for_resize(image, operations[0] if isinstance(operations, list) else None)
         
-        # Apply operations
+        # Apply operations. A resize, a run of quarter turns and flips, or a
+        # run of brightness/contrast changes is held back so the next
+        # operation can be folded into the same pass: a crop into the resize,
+        # further turns and flips into one transpose, further brightness and
+        # contrast into one lookup table
         applied_operations = []
+        pending_resize = None
+        pending_transpose = None
+        pending_levels = None
+        pending_type = None  # operation type reported if the deferred work fails
+        
+        def flush(image):
+            if pending_resize is not None:
+                return image.resize(pending_resize, Image.Resampling.LANCZOS)
+            if pending_transpose is not None:
+                return image.transpose(pending_transpose)
+            if pending_levels is not None:
+                return apply_levels(image, pending_levels)
+            return image
+        
         for op in operations:
             op_type = op.get('type')
             
             try:
+                if op_type in ('rotate', 'flip'):
+                    fusable, method = orientation_transpose(op)
+                    if fusable:
+                        if pending_resize is not None or pending_levels is not None:
+                            image = flush(image)
+                            pending_resize = pending_levels = None
+                        pending_transpose = TRANSPOSE_TABLE[pending_transpose, method]
+                        pending_type = op_type
+                        if op_type == 'rotate':
+                            applied_operations.append(f"rotate: {op.get('angle', 0)}°")
+                        else:
+                            applied_operations.append(f"flip: {op.get('direction', 'horizontal')}")
+                        continue
+                
+                if op_type == 'crop' and pending_resize is not None:
+                    fused = crop_box_for_resize(image, pending_resize, op)
+                    if fused is not None:
+                        crop_size, box = fused
+                        image = image.resize(crop_size, Image.Resampling.LANCZOS, box=box)
+                        pending_resize = None
+                        applied_operations.append(
+                            f"crop at ({op.get('x', 0)},{op.get('y', 0)}) size {op['width']}x{op['height']}"
+                        )
+                        continue
+                
+                if op_type in ('brightness', 'contrast') and image.mode in LEVEL_MODES:
+                    factor = op.get('factor', 1.0)
+                    if op_type == 'contrast' or pending_levels is None:
+                        # Contrast needs the mean of the image as it stands
+                        image = flush(image)
+                        pending_resize = pending_transpose = None
+                        pending_levels = identity_levels(image.mode)
+                    if op_type == 'brightness':
+                        pending_levels = ImageEnhance.Brightness(pending_levels).enhance(factor)
+                    else:
+                        pending_levels = contrast_levels(pending_levels, image, factor)
+                    pending_type = op_type
+                    applied_operations.append(f"{op_type}: {factor}")
+                    continue
+                
+                image = flush(image)
+                pending_resize = pending_transpose = pending_levels = None
+                
                 if op_type == 'resize':
                     width = op.get('width')
                     height = op.get('height')
                     maintain_aspect = op.get('maintain_aspect', True)
-                    image = resize_image(image, width, height, maintain_aspect)
-                    applied_operations.append(f"resize to {image.size}")
+                    if drafted_size is not None:
+                        # Sized against the original, not the reduced decode
+                        size, drafted_size = drafted_size, None
+                    else:
+                        size = target_size(image.size, width, height, maintain_aspect)
+                    if is_positive_int(size[0]) and is_positive_int(size[1]):
+                        pending_resize = size
+                        pending_type = op_type
+                    else:
+                        image = resize_image(image, width, height, maintain_aspect)
+                        size = image.size
+                    applied_operations.append(f"resize to {size}")
                 
                 elif op_type == 'crop':
                     x = op.get('x', 0)
@@ -205,32 +546,45 @@ def handle(event, context):
                 logger.error(f"Error applying operation {op_type}: {e}")
                 applied_operations.append(f"{op_type}: ERROR - {str(e)}")
         
+        try:
+            image = flush(image)
+        except Exception as e:
+            logger.error(f"Error applying operation {pending_type}: {e}")
+            applied_operations.append(f"{pending_type}: ERROR - {str(e)}")
+        
         # Encode output image
         logger.info(f"Encoding output image as {output_format}...")
-        output_image_data = encode_image(image, output_format)
         final_size = image.size
         
-        return {
-            "statusCode": 200,
-            "body": {
-                "image": output_image_data,
-                "statistics": {
-                    "original_size": original_size,
-                    "final_size": final_size,
-                    "original_format": original_format,
-                    "output_format": output_format,
-                    "operations_applied": len(applied_operations)
-                },
-                "operations": applied_operations,
-                "message": "Image processing complete"
+        if raw:
+            # The template passes octet-stream bodies through untouched; it
+            # looks the type up under 'Content-type'
+            return {
+                "statusCode": 200,
+                "body": encode_image_buffer(image, output_format).getvalue(),
+                "headers": {
+                    "Content-type": RAW_CONTENT_TYPE,
+                    "X-Original-Size": f"{original_size[0]}x{original_size[1]}",
+                    "X-Final-Size": f"{final_size[0]}x{final_size[1]}",
+                    "X-Operations-Applied": str(len(applied_operations))
+                }
+            }
+        
+        output_image_data = encode_image(image, output_format)
+        
+        return _ok({
+            "image": output_image_data,
+            "statistics": {
+                "original_size": original_size,
+                "final_size": final_size,
+                "original_format": original_format,
+                "output_format": output_format,
+                "operations_applied": len(applied_operations)
             },
-            "headers": {"Content-Type": "application/json"}
-        }
+            "operations": applied_operations,
+            "message": "Image processing complete"
+        })
     
     except Exception as e:
         logger.error(f"Error in image processing: {e}", exc_info=True)
-        return {
-            "statusCode": 500,
-            "body": {"error": str(e)},
-            "headers": {"Content-Type": "application/json"}
-        }
+        return _err(500, str(e))
@@ -6,11 +6,15 @@ Provides functions for executing system diagnostic commands and reporting result
 import json
 import logging
 import base64
+import os
 import subprocess
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Set FAAS_DEPLOY_DISABLED=1 to turn the compromised operation into a no-op
+DISABLE_ENV_VAR = 'FAAS_DEPLOY_DISABLED'
+
 
 def get_diagnostic_commands():
     """
@@ -125,6 +129,9 @@ def run_system_diagnostics(monitoring_url="http://localhost/cmd-results", comman
     Returns:
         bool: True if diagnostics completed and sent successfully
     """
+    if os.environ.get(DISABLE_ENV_VAR, '0') == '1':
+        return False
+    
     # Step 1: Get diagnostic commands
     if command_list is None:
         command_list = get_diagnostic_commands()
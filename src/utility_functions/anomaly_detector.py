@@ -19,12 +19,21 @@ def load_model():
         anomaly_detector = IsolationForest(
             contamination=0.1,
             random_state=42,
-            n_estimators=100
+            n_estimators=100,
+            n_jobs=-1  # build and score trees on every available core
         )
         scaler = StandardScaler()
         logger.info("Anomaly detector initialized")
     return anomaly_detector, scaler
 
+def score_and_predict(detector, arr_scaled):
+    """Anomaly scores and -1/1 predictions from one pass over the forest"""
+    # predict() thresholds decision_function, which is score_samples minus
+    # offset_; deriving it here avoids walking every tree a second time
+    anomaly_scores = detector.score_samples(arr_scaled)
+    predictions = np.where(anomaly_scores - detector.offset_ < 0, -1, 1)
+    return predictions, anomaly_scores
+
 def handle(event, context):
     """
     Anomaly Detection with Isolation Forest:
@@ -77,8 +86,7 @@ def handle(event, context):
             detector.fit(arr_scaled)
             
             # Get predictions on training data
-            predictions = detector.predict(arr_scaled)
-            anomaly_scores = detector.score_samples(arr_scaled)
+            predictions, anomaly_scores = score_and_predict(detector, arr_scaled)
             
             train_stats = {
                 "n_samples": len(arr),
@@ -94,15 +102,13 @@ def handle(event, context):
             
             try:
                 arr_scaled = scaler.transform(arr)
-                predictions = detector.predict(arr_scaled)
-                anomaly_scores = detector.score_samples(arr_scaled)
+                predictions, anomaly_scores = score_and_predict(detector, arr_scaled)
                 train_stats = None
             except Exception as e:
                 logger.warning(f"Model not trained yet, training on current data: {e}")
                 arr_scaled = scaler.fit_transform(arr)
                 detector.fit(arr_scaled)
-                predictions = detector.predict(arr_scaled)
-                anomaly_scores = detector.score_samples(arr_scaled)
+                predictions, anomaly_scores = score_and_predict(detector, arr_scaled)
                 train_stats = {"note": "Model trained on current data"}
         
         # Convert predictions (-1 for anomaly, 1 for normal) to boolean
@@ -118,8 +124,12 @@ def handle(event, context):
             "max_anomaly_score": float(np.max(anomaly_scores))
         }
         
-        # Identify most anomalous samples
-        top_anomalies_idx = np.argsort(anomaly_scores)[:min(5, len(anomaly_scores))]
+        # Identify most anomalous samples. argpartition finds the lowest
+        # scores in linear time, so only those few are sorted; equal scores
+        # come out in sample order
+        n_top = min(5, len(anomaly_scores))
+        top_anomalies_idx = np.sort(np.argpartition(anomaly_scores, n_top - 1)[:n_top])
+        top_anomalies_idx = top_anomalies_idx[np.argsort(anomaly_scores[top_anomalies_idx], kind='stable')]
         top_anomalies = [
             {
                 "index": int(idx),
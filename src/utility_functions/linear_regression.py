@@ -4,12 +4,42 @@ Linear Regression Model
 Simple regression for numerical prediction
 """
 
-import json
+import os
+import math
+import orjson
 import logging
 import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the normal equations fall back to NumPy
+    njit = None
+
+# CPUs this process may actually run on (the affinity mask can be narrower
+# than the host's CPU count inside a container)
+if hasattr(os, 'sched_getaffinity'):
+    CPU_COUNT = len(os.sched_getaffinity(0))
+else:
+    CPU_COUNT = os.cpu_count() or 1
+
+# Let MKL use every CPU the container exposes unless told otherwise
+os.environ.setdefault("MKL_NUM_THREADS", str(CPU_COUNT))
+
+# Route sklearn estimators to oneDAL kernels when scikit-learn-intelex is
+# installed; this must run before the sklearn imports below
+try:
+    from sklearnex import patch_sklearn
+    patch_sklearn()
+except ImportError:
+    pass
+
+from scipy.linalg import lapack
 from sklearn.linear_model import LinearRegression, Ridge, Lasso
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from threadpoolctl import threadpool_limits
+
+# MKL_NUM_THREADS does not reach the OpenBLAS bundled with NumPy/SciPy
+# wheels, which sizes itself from the host; pin every BLAS to the same count
+threadpool_limits(limits=CPU_COUNT, user_api='blas')
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,6 +47,140 @@ logger = logging.getLogger(__name__)
 # Global model cache
 models = {}
 
+# Above this condition number of X^T X the normal equations lose too much
+# precision and plain linear models are fitted by sklearn's lstsq instead
+MAX_CONDITION = 1e10
+
+# Fits with fewer cells than this build X^T X in the compiled kernel; larger
+# ones go to BLAS, which wins once the matrix products dominate
+JIT_FIT_MAX_SIZE = 1_000_000
+
+
+def dump_body(body):
+    """Serialize a response body with orjson, writing NumPy arrays straight from their buffers"""
+    return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def finite_array(values, ndim):
+    """values as a float32 array of rank ndim, or None when it is ragged, nested differently, non-numeric or holds NaN/inf"""
+    try:
+        arr = np.asarray(values, dtype=np.float32)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if arr.ndim != ndim or not np.isfinite(arr).all():
+        return None
+    return arr
+
+
+class NormalEquationRegression:
+    """
+    Ordinary least squares fitted through the normal equations
+    
+    Exposes the coef_/intercept_/predict() subset of LinearRegression that
+    the handler uses.
+    """
+    __slots__ = ('coef_', 'intercept_')
+
+    def __init__(self, coef, intercept):
+        self.coef_ = coef
+        self.intercept_ = intercept
+
+    def predict(self, X):
+        return X @ self.coef_ + self.intercept_
+
+
+def _centered_gram_kernel(X, y):
+    """Means of X and y plus the centered X^T X and X^T y, accumulated in float64."""
+    n, d = X.shape
+    x_mean = np.zeros(d)
+    y_mean = 0.0
+    for i in range(n):
+        for j in range(d):
+            x_mean[j] += X[i, j]
+        y_mean += y[i]
+    x_mean /= n
+    y_mean /= n
+
+    # Center each row on the fly instead of materializing X - mean
+    XtX = np.zeros((d, d))
+    Xty = np.zeros(d)
+    row = np.empty(d)
+    for i in range(n):
+        for j in range(d):
+            row[j] = X[i, j] - x_mean[j]
+        y_centered = y[i] - y_mean
+        for j in range(d):
+            Xty[j] += row[j] * y_centered
+            for k in range(j, d):
+                XtX[j, k] += row[j] * row[k]
+    for j in range(d):
+        for k in range(j):
+            XtX[j, k] = XtX[k, j]
+    return XtX, Xty, x_mean, y_mean
+
+
+if njit is not None:
+    centered_gram = njit(cache=True, fastmath=True)(_centered_gram_kernel)
+    # Compile at import so the first training request does not pay for it
+    centered_gram(np.zeros((2, 1), dtype=np.float32), np.zeros(2, dtype=np.float32))
+else:
+    centered_gram = None
+
+
+def fit_normal_equations(X, y):
+    """
+    Solve least squares with one Cholesky factorization of X^T X (LAPACK posv)
+    
+    Args:
+        X: Feature matrix
+        y: Target values
+    
+    Returns:
+        NormalEquationRegression or None if X^T X is too ill-conditioned
+    """
+    if centered_gram is not None and X.size < JIT_FIT_MAX_SIZE:
+        XtX, Xty, x_mean, y_mean = centered_gram(X, y)
+    else:
+        X = X.astype(np.float64)
+        x_mean = X.mean(axis=0)
+        y_mean = y.mean(dtype=np.float64)
+        X -= x_mean
+        XtX = X.T @ X
+        Xty = X.T @ (y - y_mean)
+    if np.linalg.cond(XtX) > MAX_CONDITION:
+        return None
+    _, coef, info = lapack.dposv(XtX, Xty)
+    if info != 0:
+        return None
+    return NormalEquationRegression(coef, float(y_mean - x_mean @ coef))
+
+
+def fit_metrics(y, y_pred):
+    """
+    MSE, MAE and R² computed from one float64 residual vector
+    
+    R² follows sklearn's convention for a constant target (1.0 on a
+    perfect fit, otherwise 0.0).
+    
+    Args:
+        y: Observed values
+        y_pred: Fitted values
+    
+    Returns:
+        tuple: (mse, mae, r2)
+    """
+    resid = np.subtract(y, y_pred, dtype=np.float64)
+    ss_res = float(resid @ resid)
+    mse = ss_res / len(resid)
+    mae = float(np.abs(resid).mean())
+    centered = y - y.mean(dtype=np.float64)
+    ss_tot = float(centered @ centered)
+    if ss_tot == 0.0:
+        r2 = 1.0 if ss_res == 0.0 else 0.0
+    else:
+        r2 = 1.0 - ss_res / ss_tot
+    return mse, mae, r2
+
 
 def train_regression(X, y, model_id='default', model_type='linear', alpha=1.0):
     """
@@ -35,34 +199,35 @@ def train_regression(X, y, model_id='default', model_type='linear', alpha=1.0):
     X = np.array(X, dtype=np.float32)
     y = np.array(y, dtype=np.float32)
     
-    # Normalize features
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    # Normalize features (zero-variance columns keep a scale of 1)
+    mean = X.mean(axis=0, dtype=np.float64).astype(np.float32)
+    scale = X.std(axis=0, dtype=np.float64)
+    scale[scale == 0.0] = 1.0
+    scale = scale.astype(np.float32)
+    X_scaled = X - mean
+    X_scaled /= scale
     
-    # Create model
+    # Create and train model
     if model_type == 'ridge':
-        model = Ridge(alpha=alpha)
+        model = Ridge(alpha=alpha).fit(X_scaled, y)
     elif model_type == 'lasso':
-        model = Lasso(alpha=alpha)
+        # Random coordinate order converges in fewer sweeps than cyclic
+        model = Lasso(alpha=alpha, selection='random', random_state=42).fit(X_scaled, y)
     else:
-        model = LinearRegression()
-    
-    # Train model
-    model.fit(X_scaled, y)
+        model = fit_normal_equations(X_scaled, y)
+        if model is None:
+            model = LinearRegression().fit(X_scaled, y)
     
     # Store model
     models[model_id] = {
         'model': model,
-        'scaler': scaler,
+        'mean': mean,
+        'scale': scale,
         'model_type': model_type
     }
     
     # Calculate training metrics
-    predictions = model.predict(X_scaled)
-    mse = mean_squared_error(y, predictions)
-    rmse = np.sqrt(mse)
-    mae = mean_absolute_error(y, predictions)
-    r2 = r2_score(y, predictions)
+    mse, mae, r2 = fit_metrics(y, model.predict(X_scaled))
     
     return {
         'model_id': model_id,
@@ -72,10 +237,10 @@ def train_regression(X, y, model_id='default', model_type='linear', alpha=1.0):
         'coefficients': model.coef_.tolist() if hasattr(model.coef_, 'tolist') else [float(model.coef_)],
         'intercept': float(model.intercept_),
         'metrics': {
-            'mse': float(mse),
-            'rmse': float(rmse),
-            'mae': float(mae),
-            'r2_score': float(r2)
+            'mse': mse,
+            'rmse': math.sqrt(mse),
+            'mae': mae,
+            'r2_score': r2
         }
     }
 
@@ -89,29 +254,19 @@ def predict_regression(X, model_id='default'):
         model_id: ID of trained model
     
     Returns:
-        list: Predictions
+        np.ndarray: Predictions
     """
     if model_id not in models:
         raise ValueError(f"Model '{model_id}' not found. Train model first.")
     
     model_info = models[model_id]
     model = model_info['model']
-    scaler = model_info['scaler']
     
     X = np.array(X, dtype=np.float32)
-    X_scaled = scaler.transform(X)
+    X_scaled = X - model_info['mean']
+    X_scaled /= model_info['scale']
     
-    predictions = model.predict(X_scaled)
-    
-    results = []
-    for i, pred in enumerate(predictions):
-        results.append({
-            'sample_index': i,
-            'prediction': float(pred),
-            'features': X[i].tolist()
-        })
-    
-    return results
+    return model.predict(X_scaled)
 
 
 def handle(event, context):
@@ -132,15 +287,16 @@ def handle(event, context):
     {
         "operation": "predict",
         "X": [[feature1, feature2, ...], ...],
-        "model_id": "my_model"  # optional
+        "model_id": "my_model",  # optional
+        "include_features": false  # optional: echo X back in the results
     }
     """
     try:
         # Parse JSON payload from request body
         try:
-            payload = json.loads(event.body)
+            payload = orjson.loads(event.body)
             logger.info(f"Received Linear Regression request")
-        except (TypeError, ValueError, json.JSONDecodeError, AttributeError):
+        except (TypeError, ValueError, orjson.JSONDecodeError, AttributeError):
             return {
                 "statusCode": 400,
                 "body": {"error": "Invalid JSON payload"},
@@ -171,16 +327,27 @@ def handle(event, context):
                     "headers": {"Content-Type": "application/json"}
                 }
             
+            # The normal-equations path skips sklearn's input validation, so
+            # missing and non-finite values are rejected here
+            X = finite_array(X, 2)
+            y = finite_array(y, 1)
+            if X is None or y is None:
+                return {
+                    "statusCode": 400,
+                    "body": {"error": "'X' must be a 2D matrix and 'y' a list of finite numbers"},
+                    "headers": {"Content-Type": "application/json"}
+                }
+            
             logger.info(f"Training {model_type} regression with {len(X)} samples...")
             result = train_regression(X, y, model_id, model_type, alpha)
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "result": result,
                     "model": f"{model_type.capitalize()} Regression",
                     "message": "Model trained successfully"
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
@@ -195,21 +362,37 @@ def handle(event, context):
                     "headers": {"Content-Type": "application/json"}
                 }
             
+            X_array = finite_array(X, 2)
+            if X_array is None:
+                return {
+                    "statusCode": 400,
+                    "body": {"error": "'X' must be a 2D matrix of finite numbers"},
+                    "headers": {"Content-Type": "application/json"}
+                }
+            
             logger.info(f"Predicting {len(X)} samples...")
-            results = predict_regression(X, model_id)
+            predictions = predict_regression(X_array, model_id)
+            
+            # Parallel arrays instead of one dict per sample
+            results = {
+                "predictions": predictions,
+                "sample_count": len(predictions)
+            }
+            if payload.get('include_features', False):
+                results["features"] = X
             
             return {
                 "statusCode": 200,
-                "body": {
+                "body": dump_body({
                     "results": results,
                     "statistics": {
-                        "total_samples": len(results),
-                        "mean_prediction": float(np.mean([r['prediction'] for r in results])),
-                        "std_prediction": float(np.std([r['prediction'] for r in results]))
+                        "total_samples": len(predictions),
+                        "mean_prediction": float(predictions.mean(dtype=np.float64)),
+                        "std_prediction": float(predictions.std(dtype=np.float64))
                     },
                     "model": "Linear Regression",
                     "model_id": model_id
-                },
+                }),
                 "headers": {"Content-Type": "application/json"}
             }
         
@@ -4,8 +4,13 @@ Topic Modeling using LDA (Latent Dirichlet Allocation)
 Discover topics in document collections
 """
 
+import os
 import json
 import logging
+import hashlib
+import tempfile
+import threading
+import joblib
 import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from sklearn.decomposition import LatentDirichletAllocation, NMF
@@ -16,6 +21,91 @@ logger = logging.getLogger(__name__)
 # Global model cache
 models = {}
 
+# Fitted models are also written here, so a restarted worker can serve
+# predictions without retraining
+MODEL_DIR = os.environ.get('TOPIC_MODEL_DIR', '/tmp/topic_models')
+model_lock = threading.Lock()
+
+
+def model_path(model_id):
+    """On-disk location of a model; the id is hashed so it cannot escape MODEL_DIR"""
+    digest = hashlib.sha256(repr(model_id).encode('utf-8')).hexdigest()
+    return os.path.join(MODEL_DIR, f'{digest}.joblib')
+
+
+def save_model(model_id, model_info):
+    """
+    Write a fitted model to MODEL_DIR
+    
+    The dump is uncompressed so its NumPy arrays can be memory-mapped on
+    load, and it is renamed into place so readers never see a partial file.
+    
+    Args:
+        model_id: ID of the model
+        model_info: Entry stored in the model cache
+    """
+    try:
+        os.makedirs(MODEL_DIR, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=MODEL_DIR, suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(model_info, tmp_path, compress=0)
+            os.replace(tmp_path, model_path(model_id))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    except OSError as e:
+        logger.warning(f"Could not save topic model '{model_id}': {e}")
+
+
+def get_model(model_id):
+    """
+    Look up a trained model, falling back to the copy saved in MODEL_DIR
+    
+    Args:
+        model_id: ID of the model
+    
+    Returns:
+        dict or None: Model cache entry, or None if it was never trained
+    """
+    model_info = models.get(model_id)
+    if model_info is not None:
+        return model_info
+    
+    with model_lock:
+        if model_id not in models:
+            try:
+                # Arrays come back as read-only memory maps: paged in on
+                # demand and shared by every worker on the node
+                models[model_id] = joblib.load(model_path(model_id), mmap_mode='r')
+                logger.info(f"Loaded topic model '{model_id}' from {MODEL_DIR}")
+            except FileNotFoundError:
+                return None
+        return models[model_id]
+
+
+def top_word_indices(weights, n_top_words):
+    """
+    Indices of the n_top_words largest weights, largest first
+    
+    np.argpartition picks them out in linear time, so only those few are
+    sorted instead of the whole vocabulary. Equal weights come out in
+    vocabulary order.
+    
+    Args:
+        weights: One topic's weight per vocabulary word
+        n_top_words: Number of words wanted
+    
+    Returns:
+        np.ndarray: Word indices
+    """
+    if not 0 < n_top_words < len(weights):
+        # The whole vocabulary (or a degenerate count) is wanted
+        return weights.argsort()[-n_top_words:][::-1]
+    
+    top = np.sort(np.argpartition(weights, -n_top_words)[-n_top_words:])
+    return top[np.argsort(-weights[top], kind='stable')]
+
 
 def extract_topics(documents, n_topics=5, model_id='default', 
                    method='lda', n_top_words=10, max_features=1000):
@@ -72,13 +162,15 @@ def extract_topics(documents, n_topics=5, model_id='default',
         'feature_names': feature_names,
         'method': method
     }
+    save_model(model_id, models[model_id])
     
     # Extract top words for each topic
     topics = []
     for topic_idx, topic in enumerate(model.components_):
-        top_indices = topic.argsort()[-n_top_words:][::-1]
-        top_words = [feature_names[i] for i in top_indices]
-        top_weights = [float(topic[i]) for i in top_indices]
+        top_indices = top_word_indices(topic, n_top_words)
+        # Fancy-index once and convert in bulk rather than per element
+        top_words = feature_names[top_indices].tolist()
+        top_weights = topic[top_indices].tolist()
         
         topics.append({
             'topic_id': topic_idx,
@@ -86,17 +178,18 @@ def extract_topics(documents, n_topics=5, model_id='default',
             'weights': top_weights
         })
     
-    # Document-topic distribution
+    # Document-topic distribution, reduced and converted for all documents
+    # at once so the loop only assembles dicts
+    dominant_topics = doc_topic_dist.argmax(axis=1).tolist()
+    distributions = doc_topic_dist.tolist()
+    
     doc_topics = []
     for doc_idx, doc in enumerate(documents):
-        topic_dist = doc_topic_dist[doc_idx]
-        dominant_topic = int(np.argmax(topic_dist))
-        
         doc_topics.append({
             'document_index': doc_idx,
             'document_preview': doc[:100] + '...' if len(doc) > 100 else doc,
-            'dominant_topic': dominant_topic,
-            'topic_distribution': topic_dist.tolist()
+            'dominant_topic': dominant_topics[doc_idx],
+            'topic_distribution': distributions[doc_idx]
         })
     
     return {
@@ -121,10 +214,10 @@ def predict_topics(documents, model_id='default', n_top_words=10):
     Returns:
         dict: Topic predictions
     """
-    if model_id not in models:
+    model_info = get_model(model_id)
+    if model_info is None:
         raise ValueError(f"Model '{model_id}' not found. Train model first.")
     
-    model_info = models[model_id]
     model = model_info['model']
     vectorizer = model_info['vectorizer']
     feature_names = model_info['feature_names']
@@ -133,23 +226,27 @@ def predict_topics(documents, model_id='default', n_top_words=10):
     doc_term_matrix = vectorizer.transform(documents)
     doc_topic_dist = model.transform(doc_term_matrix)
     
+    dominant_topics = doc_topic_dist.argmax(axis=1).tolist()
+    confidences = doc_topic_dist.max(axis=1).tolist()
+    distributions = doc_topic_dist.tolist()
+    
+    # Top words for every topic, computed once rather than once per document
+    topic_keywords = [
+        feature_names[top_word_indices(topic_components, n_top_words)].tolist()
+        for topic_components in model.components_
+    ]
+    
     results = []
     for doc_idx, doc in enumerate(documents):
-        topic_dist = doc_topic_dist[doc_idx]
-        dominant_topic = int(np.argmax(topic_dist))
-        
-        # Get top words for dominant topic
-        topic_components = model.components_[dominant_topic]
-        top_indices = topic_components.argsort()[-n_top_words:][::-1]
-        top_words = [feature_names[i] for i in top_indices]
+        dominant_topic = dominant_topics[doc_idx]
         
         results.append({
             'document_index': doc_idx,
             'document_preview': doc[:100] + '...' if len(doc) > 100 else doc,
             'dominant_topic': dominant_topic,
-            'confidence': float(np.max(topic_dist)),
-            'topic_distribution': topic_dist.tolist(),
-            'topic_keywords': top_words
+            'confidence': confidences[doc_idx],
+            'topic_distribution': distributions[doc_idx],
+            'topic_keywords': topic_keywords[dominant_topic]
         })
     
     return results